@@ -6,6 +6,7 @@ Provides endpoint for generating reasoning about CO2 concentration anomalies
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 from typing import Dict, Any
+import functools
 import os
 from dotenv import load_dotenv
 
@@ -21,6 +22,10 @@ app = Flask(__name__, static_folder='.')
 # CORS設定: すべてのオリジン許可（開発用）
 CORS(app)
 
+# /api/reasoning の必須パラメータと許容severity値（frozensetでC実装の集合演算を使う）
+REQUIRED_FIELDS = frozenset({'lat', 'lon', 'co2', 'deviation', 'date', 'severity', 'zscore'})
+VALID_SEVERITIES = frozenset({'high', 'medium', 'low'})
+
 
 # 静的ファイル配信ルート（APIより先に定義）
 @app.route('/')
@@ -31,6 +36,37 @@ def index():
     return send_from_directory('.', 'sample_calendar.html')
 
 
+@functools.lru_cache(maxsize=1024)
+def _resolve_static_cached(filename: str):
+    """
+    静的ファイルのパスを解決して(ディレクトリ, ファイル名)を返す
+    ヒットのみLRUキャッシュされ、ホットなファイルのリクエストごとの
+    stat()システムコールを省く。見つからない場合は例外を投げる
+    （lru_cacheは例外を記憶しないため、後から生成されたファイルは
+    次のリクエストで正しく解決される）
+    """
+    # GeoJSONファイルはdata/geojson/から提供
+    if filename.endswith('.geojson'):
+        geojson_dir = os.path.join('data', 'geojson')
+        if os.path.exists(os.path.join(geojson_dir, filename)):
+            return geojson_dir, filename
+
+    if os.path.exists(os.path.join('.', filename)):
+        return '.', filename
+
+    raise FileNotFoundError(filename)
+
+
+def _resolve_static(filename: str):
+    """
+    _resolve_static_cachedのNone返し版（呼び出し側の分岐はそのまま）
+    """
+    try:
+        return _resolve_static_cached(filename)
+    except FileNotFoundError:
+        return None
+
+
 @app.route('/<path:filename>')
 def serve_static(filename: str):
     """
@@ -41,18 +77,13 @@ def serve_static(filename: str):
     if filename.startswith('api/') or filename.startswith('api'):
         return jsonify({"error": "Not found"}), 404
 
-    # GeoJSONファイルはdata/geojson/から提供
-    if filename.endswith('.geojson'):
-        file_path = os.path.join('data', 'geojson', filename)
-        if os.path.exists(file_path):
-            return send_from_directory(os.path.join('data', 'geojson'), filename)
-
-    # ファイルが存在するか確認
-    file_path = os.path.join('.', filename)
-    if not os.path.exists(file_path):
+    resolved = _resolve_static(filename)
+    if resolved is None:
         return jsonify({"error": "File not found", "path": filename}), 404
 
-    return send_from_directory('.', filename)
+    # max_ageでブラウザ側キャッシュを有効化（再訪時の転送を削減）
+    directory, resolved_filename = resolved
+    return send_from_directory(directory, resolved_filename, max_age=3600)
 
 
 @app.route('/api/health', methods=['GET'])
@@ -97,14 +128,20 @@ def reasoning() -> tuple:
             "cached": bool,
             "cache_key": str
         }
+
+    200レスポンスにはETag（=キャッシュキー）を付与する。クライアントが
+    If-None-Matchで同じ値を提示した場合は本文なしの304を返す。
     """
     try:
-        # 1. リクエストパース
-        data = request.get_json()
+        # 1. リクエストパース（cache=Trueで再パースを回避）
+        data = request.get_json(cache=True, silent=True)
+        # 非dictのJSON（配列・文字列・null等）も「全フィールド欠落」の
+        # 400として扱う（dict.keys()前提の集合差分に渡さない）
+        if not isinstance(data, dict):
+            data = {}
 
-        # 必須パラメータのバリデーション
-        required_fields = ['lat', 'lon', 'co2', 'deviation', 'date', 'severity', 'zscore']
-        missing_fields = [field for field in required_fields if field not in data]
+        # 必須パラメータのバリデーション（集合差分1回で判定）
+        missing_fields = sorted(REQUIRED_FIELDS - data.keys())
 
         if missing_fields:
             return jsonify({
@@ -112,37 +149,53 @@ def reasoning() -> tuple:
                 "missing_fields": missing_fields
             }), 400
 
-        # パラメータの取得
+        # 2. キャッシュキーに必要な値だけ先に変換してキャッシュを確認
+        #    （ヒット時は残りの変換・バリデーションをスキップ）
         lat = float(data['lat'])
         lon = float(data['lon'])
-        co2 = float(data['co2'])
-        deviation = float(data['deviation'])
         date = str(data['date'])
-        severity = str(data['severity'])
-        zscore = float(data['zscore'])
 
-        # severityのバリデーション
-        if severity not in ['high', 'medium', 'low']:
-            return jsonify({
-                "error": "Invalid severity value",
-                "message": "severity must be one of: high, medium, low"
-            }), 400
-
-        # 2. キャッシュキー生成
         cache_key = cache_manager.generate_cache_key(lat, lon, date)
+        # RFC 7232準拠: entity-tagはDQUOTEで包んで送出し、比較は
+        # werkzeugのETagsオブジェクトに任せる（引用符や W/ 付きの
+        # If-None-Matchを送る正規のクライアント・中間キャッシュでも
+        # 304が成立するように）
+        cache_key_etag = f'"{cache_key}"'
+
+        # 3. HTTPレベルのキャッシュ検証: キャッシュキーはそのままETagとして
+        #    使える（同じ地点・日付なら推論結果も同じ）。クライアントが
+        #    If-None-Matchで同じETagを提示したら、本文なしの304を返して
+        #    キャッシュ参照もGemini呼び出しもスキップする
+        if request.if_none_match.contains(cache_key):
+            return '', 304, {'ETag': cache_key_etag}
 
-        # 3. キャッシュ確認
+        # 4. キャッシュヒット → 即座に返却
         cached_reasoning = cache_manager.get_cached_reasoning(cache_key)
 
-        # 4. キャッシュヒット → 即座に返却
         if cached_reasoning:
             return jsonify({
                 "reasoning": cached_reasoning,
                 "cached": True,
                 "cache_key": cache_key
-            }), 200
+            }), 200, {
+                'ETag': cache_key_etag,
+                'Cache-Control': 'public, max-age=86400',
+            }
 
-        # 5. キャッシュミス → Gemini API呼び出し
+        # 5. キャッシュミス → 残りのパラメータを変換・バリデーション
+        co2 = float(data['co2'])
+        deviation = float(data['deviation'])
+        severity = str(data['severity'])
+        zscore = float(data['zscore'])
+
+        # severityのバリデーション
+        if severity not in VALID_SEVERITIES:
+            return jsonify({
+                "error": "Invalid severity value",
+                "message": "severity must be one of: high, medium, low"
+            }), 400
+
+        # 6. Gemini API呼び出し
         try:
             reasoning_text = gemini_client.generate_inference(
                 lat=lat,
@@ -159,7 +212,7 @@ def reasoning() -> tuple:
                 "message": str(e)
             }), 500
 
-        # 6. キャッシュ保存
+        # 7. キャッシュ保存
         metadata = {
             "lat": lat,
             "lon": lon,
@@ -175,12 +228,15 @@ def reasoning() -> tuple:
             # キャッシュ保存に失敗してもレスポンスは返す
             print(f"Warning: Failed to save to cache for key: {cache_key}")
 
-        # 7. レスポンス返却
+        # 8. レスポンス返却
         return jsonify({
             "reasoning": reasoning_text,
             "cached": False,
             "cache_key": cache_key
-        }), 200
+        }), 200, {
+            'ETag': cache_key_etag,
+            'Cache-Control': 'public, max-age=86400',
+        }
 
     except ValueError as e:
         return jsonify({
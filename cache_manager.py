@@ -2,71 +2,213 @@
 JSON Cache Manager for weather reasoning data
 
 This module provides functionality to cache weather reasoning data
-using JSON file storage.
+using an append-only JSON Lines file (one entry per line, last write wins).
+Appending a single line per save avoids re-reading and rewriting the whole
+cache file on every insert.
 """
 
 import json
 import hashlib
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional, Dict, Any
 from datetime import datetime
 
 
-CACHE_FILE = "cache.json"
+# orjson is noticeably faster than stdlib json at both loads and dumps;
+# fall back to stdlib json when it isn't installed
+try:
+    import orjson
 
+    def _json_loads(data):
+        return orjson.loads(data)
 
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Module logger with a NullHandler default: callers/deployments decide
+# where records go, and concurrent workers don't serialize on stdout the
+# way bare print() calls do
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+CACHE_FILE = "cache.jsonl"
+
+# In-process cache in front of the file store: repeat lookups for hot keys
+# return without re-reading and re-parsing the file. Bounded LRU so a
+# long-running process can't grow without limit.
+_MEM_CACHE_MAX_ENTRIES = 10000
+_MEM_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_MEM_CACHE_LOCK = threading.Lock()
+
+
+# Parsed snapshot of the cache file, validated against the file's stat
+# signature: repeated load_cache() calls (every lookup that misses the
+# LRU above) skip the full re-parse while the file is unchanged
+_FILE_CACHE: Optional[Dict[str, Any]] = None
+_FILE_CACHE_SIG = None
+
+# Timestamp memoized per wall-clock second: bursts of saves within the
+# same second reuse one formatted string instead of re-running
+# datetime.now().isoformat() each time
+_LAST_TS = (0, "")
+
+
+def _now_iso() -> str:
+    """Return the current ISO timestamp at 1-second granularity."""
+    global _LAST_TS
+    now = int(time.time())
+    if _LAST_TS[0] != now:
+        _LAST_TS = (now, datetime.now().isoformat(timespec='seconds'))
+    return _LAST_TS[1]
+
+
+def _mem_cache_put(cache_key: str, reasoning: str) -> None:
+    """Store a reasoning string in the in-process LRU cache."""
+    with _MEM_CACHE_LOCK:
+        _MEM_CACHE[cache_key] = reasoning
+        _MEM_CACHE.move_to_end(cache_key)
+        while len(_MEM_CACHE) > _MEM_CACHE_MAX_ENTRIES:
+            _MEM_CACHE.popitem(last=False)
+
+
+@lru_cache(maxsize=4096)
 def generate_cache_key(lat: float, lon: float, date: str) -> str:
     """
     Generate a unique cache key from latitude, longitude, and date.
 
+    Results are memoized: callers routinely derive the same key several
+    times per request (lookup, then save), and a dict hit is far cheaper
+    than re-hashing.
+
     Args:
         lat: Latitude coordinate
         lon: Longitude coordinate
         date: Date string (format: YYYY-MM-DD)
 
     Returns:
-        str: SHA256 hash of the combined parameters
+        str: BLAKE2b hash (32 hex chars) of the combined parameters
 
     Example:
         >>> generate_cache_key(35.6762, 139.6503, "2025-01-15")
         'a1b2c3d4e5f6...'
     """
-    key_string = f"{lat}_{lon}_{date}"
-    return hashlib.sha256(key_string.encode('utf-8')).hexdigest()
+    # BLAKE2b is several times faster than SHA-256 and a 16-byte digest is
+    # plenty for a local cache key. Must stay identical to the Lambda
+    # handler's generate_cache_key so Flask and Lambda keys match.
+    # Migration note: entries written under the old 64-char SHA-256 keys
+    # are never looked up again - they simply miss, get regenerated under
+    # the new key, and the stale lines disappear on the next
+    # compact_cache() run (DynamoDB copies age out via their TTL).
+    # Coordinates are formatted at fixed 4-decimal precision (~11m at the
+    # equator) so float repr noise can't turn repeat lookups into misses.
+    key_string = f"{lat:.4f}_{lon:.4f}_{date}"
+    return hashlib.blake2b(key_string.encode('utf-8'), digest_size=16).hexdigest()
 
 
 def load_cache() -> Dict[str, Any]:
     """
-    Load cache data from JSON file.
+    Load cache data from the JSON Lines file.
 
+    Each line is one JSON entry; duplicate keys are resolved last-write-wins.
     If the file doesn't exist, returns an empty dictionary.
-    If the file is corrupted, returns an empty dictionary and logs error.
+    Corrupted lines are skipped with a warning instead of discarding the cache.
 
     Returns:
-        dict: Cache data dictionary
+        dict: Cache data dictionary keyed by cache key
 
     Raises:
         None: All exceptions are caught and handled internally
     """
+    global _FILE_CACHE, _FILE_CACHE_SIG
+
     if not os.path.exists(CACHE_FILE):
+        _FILE_CACHE = None
+        _FILE_CACHE_SIG = None
         return {}
 
+    cache_data: Dict[str, Any] = {}
     try:
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
-            if not isinstance(cache_data, dict):
-                print(f"Warning: Cache file is not a valid dictionary. Returning empty cache.")
-                return {}
-            return cache_data
-    except json.JSONDecodeError as e:
-        print(f"Error: Cache file is corrupted (JSONDecodeError). Details: {e}")
-        print(f"Returning empty cache. Consider backing up and deleting {CACHE_FILE}")
-        return {}
+        # Reuse the previous parse while the file is unchanged on disk
+        stat = os.stat(CACHE_FILE)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if _FILE_CACHE is not None and signature == _FILE_CACHE_SIG:
+            return _FILE_CACHE
+
+        # Binary mode: both JSON decoders accept UTF-8 bytes directly,
+        # so there's no need for a text-layer decode pass
+        with open(CACHE_FILE, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = _json_loads(line)
+                except ValueError as e:
+                    logger.warning(f"Skipping corrupted cache line (JSONDecodeError). Details: {e}")
+                    continue
+                if not isinstance(entry, dict) or "key" not in entry:
+                    logger.warning("Skipping cache line without a valid key.")
+                    continue
+                key = entry.pop("key")
+                cache_data[key] = entry
+
+        _FILE_CACHE = cache_data
+        _FILE_CACHE_SIG = signature
+        return cache_data
     except Exception as e:
-        print(f"Error loading cache: {e}")
+        logger.error(f"Error loading cache: {e}")
         return {}
 
 
+def _scan_reasoning(cache_key: str) -> Optional[str]:
+    """
+    Stream-scan the cache file for a single key without a full parse.
+
+    Used when the parsed snapshot is stale: instead of JSON-decoding
+    every line just to look up one key, run a C-level substring search
+    per line and decode only the final match (last write wins). On an
+    N-entry file this parses one entry instead of N.
+
+    Returns:
+        str: The reasoning text if found, None otherwise
+
+    Raises:
+        OSError: If the cache file cannot be read
+    """
+    needle = b'"key":' + _json_dumps(cache_key)
+    match = None
+    with open(CACHE_FILE, 'rb') as f:
+        for line in f:
+            if needle in line:
+                match = line
+
+    if match is None:
+        return None
+
+    try:
+        entry = _json_loads(match)
+    except ValueError:
+        return None
+
+    # Guard against the needle appearing inside a reasoning string
+    if not isinstance(entry, dict) or entry.get("key") != cache_key:
+        return None
+    return entry.get("reasoning")
+
+
 def get_cached_reasoning(cache_key: str) -> Optional[str]:
     """
     Get cached reasoning data for a given cache key.
@@ -83,6 +225,28 @@ def get_cached_reasoning(cache_key: str) -> Optional[str]:
         >>> reasoning = get_cached_reasoning(key)
         >>> print(reasoning)  # None if not cached, or the reasoning text
     """
+    # Fast path: hot keys are served from the in-process cache
+    with _MEM_CACHE_LOCK:
+        if cache_key in _MEM_CACHE:
+            _MEM_CACHE.move_to_end(cache_key)
+            return _MEM_CACHE[cache_key]
+
+    # If the parsed snapshot is stale (file changed since the last full
+    # parse), a single-key scan is cheaper than rebuilding the whole
+    # dict: the snapshot is only rebuilt when load_cache() is next asked
+    # for everything
+    try:
+        if os.path.exists(CACHE_FILE):
+            stat = os.stat(CACHE_FILE)
+            if _FILE_CACHE is None or (stat.st_mtime_ns, stat.st_size) != _FILE_CACHE_SIG:
+                reasoning = _scan_reasoning(cache_key)
+                if reasoning is not None:
+                    _mem_cache_put(cache_key, reasoning)
+                return reasoning
+    except OSError as e:
+        logger.error(f"Error scanning cache: {e}")
+        return None
+
     cache_data = load_cache()
 
     if cache_key not in cache_data:
@@ -90,6 +254,7 @@ def get_cached_reasoning(cache_key: str) -> Optional[str]:
 
     entry = cache_data[cache_key]
     if isinstance(entry, dict) and "reasoning" in entry:
+        _mem_cache_put(cache_key, entry["reasoning"])
         return entry["reasoning"]
 
     return None
@@ -114,30 +279,126 @@ def save_to_cache(cache_key: str, reasoning: str, metadata: Optional[Dict[str, A
         True
     """
     try:
-        # Load existing cache
-        cache_data = load_cache()
+        # Keep the in-process cache consistent with what we're about to write
+        _mem_cache_put(cache_key, reasoning)
 
-        # Prepare cache entry
+        # Prepare cache entry (the key is stored inline so each line is self-contained)
         cache_entry = {
+            "key": cache_key,
             "reasoning": reasoning,
-            "cached_at": datetime.now().isoformat(),
+            "cached_at": _now_iso(),
         }
 
         # Add metadata if provided
         if metadata is not None:
             cache_entry["metadata"] = metadata
 
-        # Update cache
-        cache_data[cache_key] = cache_entry
+        # If the existing file doesn't end with a newline (e.g. truncated or
+        # corrupted), start on a fresh line so this entry stays parseable
+        needs_newline = False
+        if os.path.exists(CACHE_FILE) and os.path.getsize(CACHE_FILE) > 0:
+            with open(CACHE_FILE, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+
+        # Append a single compact line of UTF-8 bytes - no pretty-printing,
+        # no load or rewrite of existing entries
+        with open(CACHE_FILE, 'ab') as f:
+            if needs_newline:
+                f.write(b"\n")
+            f.write(_json_dumps(cache_entry) + b"\n")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"Error saving to cache: {e}")
+        return False
+
+
+def save_many(items) -> bool:
+    """
+    Save several cache entries with a single file append.
+
+    Saving N entries through save_to_cache() costs N open/stat/append
+    cycles; batching them into one buffered write amortizes that to a
+    single cycle for the whole batch.
+
+    Args:
+        items: Iterable of (cache_key, reasoning, metadata) tuples;
+            metadata may be None
+
+    Returns:
+        bool: True if all entries were written, False otherwise
+
+    Example:
+        >>> save_many([(key1, "Sunny", None), (key2, "Rainy", {"lat": 51.5})])
+        True
+    """
+    try:
+        timestamp = _now_iso()
+        lines = []
+        for cache_key, reasoning, metadata in items:
+            _mem_cache_put(cache_key, reasoning)
+            cache_entry = {
+                "key": cache_key,
+                "reasoning": reasoning,
+                "cached_at": timestamp,
+            }
+            if metadata is not None:
+                cache_entry["metadata"] = metadata
+            lines.append(_json_dumps(cache_entry))
+
+        if not lines:
+            return True
+
+        # Same truncation guard as save_to_cache, paid once per batch
+        needs_newline = False
+        if os.path.exists(CACHE_FILE) and os.path.getsize(CACHE_FILE) > 0:
+            with open(CACHE_FILE, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+
+        with open(CACHE_FILE, 'ab') as f:
+            if needs_newline:
+                f.write(b"\n")
+            f.write(b"\n".join(lines) + b"\n")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"Error saving batch to cache: {e}")
+        return False
+
+
+def compact_cache() -> bool:
+    """
+    Rewrite the append-only cache file, collapsing duplicate keys.
+
+    Because saves only ever append, a key updated many times leaves stale
+    lines behind. Compaction rewrites the file with one line per key
+    (last write wins), shrinking it and speeding up future loads.
+
+    Returns:
+        bool: True if compaction succeeded, False otherwise
+    """
+    try:
+        cache_data = load_cache()
 
-        # Save to file
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
+        # Write to a temp file and os.replace() it into place: atomic on
+        # both POSIX and Windows, so a crash mid-compaction can never
+        # leave a truncated cache file behind
+        tmp_file = CACHE_FILE + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            for key, entry in cache_data.items():
+                line = {"key": key}
+                line.update(entry)
+                f.write(_json_dumps(line) + b"\n")
+        os.replace(tmp_file, CACHE_FILE)
 
         return True
 
     except Exception as e:
-        print(f"Error saving to cache: {e}")
+        logger.error(f"Error compacting cache: {e}")
         return False
 
 
@@ -147,5 +408,7 @@ __all__ = [
     'load_cache',
     'get_cached_reasoning',
     'save_to_cache',
+    'save_many',
+    'compact_cache',
     'CACHE_FILE'
 ]
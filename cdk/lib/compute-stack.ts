@@ -91,7 +91,7 @@ export class ComputeStack extends cdk.Stack {
       description: 'Dependencies for reasoning Lambda: boto3',
       code: lambda.Code.fromAsset(layerPath, {
         bundling: hasPythonDir ? undefined : {
-          image: lambda.Runtime.PYTHON_3_11.bundlingImage,
+          image: lambda.Runtime.PYTHON_3_12.bundlingImage,
           command: [
             'bash',
             '-c',
@@ -104,7 +104,7 @@ export class ComputeStack extends cdk.Stack {
           user: 'root',
         },
       }),
-      compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
       removalPolicy: cdk.RemovalPolicy.DESTROY,
     });
 
@@ -115,9 +115,18 @@ export class ComputeStack extends cdk.Stack {
     this.reasoningFunction = new lambda.Function(this, 'ReasoningFunction', {
       functionName: getResourceName(config, 'reasoning-api'),
       description: 'CO2 anomaly reasoning API with Bedrock Nova AI and DynamoDB caching',
-      runtime: lambda.Runtime.PYTHON_3_11,
+      runtime: lambda.Runtime.PYTHON_3_12,
       handler: 'index.lambda_handler',
       code: lambda.Code.fromAsset(path.join(__dirname, '../lambda/reasoning-handler')),
+      // SnapStart snapshots the post-INIT state (imports, boto3 clients,
+      // pre-warmed DynamoDB connection) and restores it on cold start,
+      // removing most of the Python import cost. Requires Python 3.12+
+      // and published versions; mutually exclusive with provisioned
+      // concurrency, which covers the same problem when configured.
+      snapStart:
+        config.provisionedConcurrency > 0
+          ? undefined
+          : lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
       layers: [dependenciesLayer],
       role: props.lambdaExecutionRole,
       timeout: cdk.Duration.seconds(30),
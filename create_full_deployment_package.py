@@ -2,12 +2,20 @@
 """
 Create a full Lambda deployment package with dependencies
 """
+import compileall
 import subprocess
 import sys
 import os
 import shutil
 import zipfile
 
+# Target runtime: arm64 (Graviton) is cheaper than x86_64 and starts
+# faster for small Python functions. Keep these in one place so the pip
+# platform tags and the Lambda architecture can't drift apart.
+LAMBDA_ARCHITECTURE = "arm64"
+PIP_PLATFORM = "manylinux2014_aarch64"
+PYTHON_VERSION = "3.12"
+
 def install_dependencies():
     """Install dependencies to a temporary directory"""
     print("[INFO] Installing dependencies...")
@@ -21,16 +29,41 @@ def install_dependencies():
     os.makedirs(target_dir)
 
     # Install dependencies
+    # Note: the reasoning handler calls Bedrock through boto3; the heavyweight
+    # google-generativeai tree (google-api-core, protobuf, grpcio) is only
+    # used by the Flask app and has no place in the Lambda zip
     subprocess.run([
         sys.executable, "-m", "pip", "install",
-        "google-generativeai",
         "boto3",
+        "orjson",
         "-t", target_dir,
-        "--platform", "manylinux2014_x86_64",
+        "--platform", PIP_PLATFORM,
         "--only-binary=:all:",
-        "--python-version", "3.11"
+        "--python-version", PYTHON_VERSION,
+        "--implementation", "cp",
+        "--abi", "cp" + PYTHON_VERSION.replace(".", "")
     ], check=False)  # Don't check return code, some packages might not be platform-specific
 
+    # Pre-compile to optimized bytecode so Lambda doesn't parse/compile
+    # every dependency module during cold-start INIT. legacy=True puts
+    # each .pyc next to its source so the zip layout stays flat.
+    #
+    # Hard guard: the zip ships .pyc files only (sources are stripped in
+    # create_deployment_package), and bytecode magic numbers are
+    # interpreter-version specific. Compiling with anything other than
+    # the target runtime would make every dependency import fail with
+    # "bad magic number" on Lambda, so refuse rather than build a
+    # silently broken package.
+    running = f"{sys.version_info[0]}.{sys.version_info[1]}"
+    if running != PYTHON_VERSION:
+        raise RuntimeError(
+            f"Must run under Python {PYTHON_VERSION} to precompile bytecode "
+            f"for the python{PYTHON_VERSION} Lambda runtime (running {running}); "
+            f"re-run with e.g. 'python{PYTHON_VERSION} {sys.argv[0]}'"
+        )
+    print("[INFO] Pre-compiling dependencies to bytecode...")
+    compileall.compile_dir(target_dir, legacy=True, optimize=2, quiet=1, workers=0)
+
     print(f"[OK] Dependencies installed to {target_dir}")
     return target_dir
 
@@ -43,11 +76,14 @@ def create_deployment_package(package_dir):
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         # Add all files from package directory
         for root, dirs, files in os.walk(package_dir):
-            # Skip __pycache__ and dist-info directories
-            dirs[:] = [d for d in dirs if d != '__pycache__' and not d.endswith('.dist-info')]
+            # Skip __pycache__, dist-info and bundled test directories
+            dirs[:] = [d for d in dirs if d not in ('__pycache__', 'tests')
+                       and not d.endswith('.dist-info')]
 
             for file in files:
-                if file.endswith('.pyc'):
+                # Ship only the precompiled .pyc files - sources and type
+                # stubs just add zip size and cold-start compile work
+                if file.endswith(('.py', '.pyi')):
                     continue
 
                 file_path = os.path.join(root, file)
@@ -74,6 +110,7 @@ def update_lambda(zip_path):
         "aws", "lambda", "update-function-code",
         "--function-name", function_name,
         "--zip-file", f"fileb://{zip_path}",
+        "--architectures", LAMBDA_ARCHITECTURE,
         "--profile", profile,
         "--region", region
     ]
@@ -81,7 +118,7 @@ def update_lambda(zip_path):
     result = subprocess.run(cmd, capture_output=True, text=True)
 
     if result.returncode == 0:
-        print("[OK] Lambda function updated successfully")
+        print(f"[OK] Lambda function updated successfully ({LAMBDA_ARCHITECTURE})")
         return True
     else:
         print(f"[ERROR] Failed to update Lambda function")
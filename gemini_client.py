@@ -4,8 +4,50 @@ CO2異常検知データに対する推論を生成するためのGemini API呼
 """
 
 import os
-import google.generativeai as genai
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+
+# google.generativeai は import が重い（google-api-core / protobuf / grpcio）ため
+# トップレベルでは読み込まず、実際にAPIを呼ぶ時点で遅延インポートする
+# （キャッシュヒットだけを返すプロセスはSDKを一切読み込まない）
+
+# GenerativeModel インスタンスのキャッシュ
+# configure() と GenerativeModel() は内部でgRPCチャネルやproto記述子を
+# 再初期化するため、(APIキー, モデル名) ごとに1回だけ構築して使い回す
+_MODEL_CACHE = {}
+
+# 429（レート制限）の再試行回数と、クォータ枯渇時のサーキットブレーカ。
+# 無料枠では429が日常的に発生するため、指数バックオフで数回粘り、
+# それでも駄目なら一定時間はAPIを呼ばずに即座に失敗させて
+# 無駄な試行（とさらなるクォータ消費）を避ける
+_RETRY_ATTEMPTS = 3
+_QUOTA_COOLDOWN_SECONDS = 60
+_quota_exceeded_until = 0.0
+
+# プロンプト関連の定数（呼び出しごとに再構築しないようモジュールスコープに配置）
+# Lambda側 (cdk/lambda/reasoning-handler/index.py) の定数と同じ構成
+_SEVERITY_JA = {
+    "high": "高",
+    "medium": "中",
+    "low": "低"
+}
+
+_PROMPT_TEMPLATE = """以下のCO2濃度異常データについて、専門家の視点から分析し、日本語で200-300文字程度で推論してください。
+
+【観測データ】
+- 日付: {date}
+- 位置: 緯度 {lat:.2f}°, 経度 {lon:.2f}°
+- CO2濃度: {co2:.2f} ppm
+- 偏差: {deviation:.2f} ppm
+- 異常度: {severity_ja}
+- Zスコア: {zscore:.2f}
+
+【推論内容】
+この地点でのCO2濃度異常の考えられる原因、その地域の特徴、および環境への影響について、科学的根拠に基づいて分析してください。
+地理的な特性や、その時期の気候的要因も考慮してください。
+"""
 
 
 class GeminiAPIError(Exception):
@@ -58,28 +100,17 @@ def generate_prompt(
     Returns:
         str: Gemini APIに送信するプロンプト
     """
-    severity_ja = {
-        "high": "高",
-        "medium": "中",
-        "low": "低"
-    }.get(severity, severity)
-
-    prompt = f"""以下のCO2濃度異常データについて、専門家の視点から分析し、日本語で200-300文字程度で推論してください。
-
-【観測データ】
-- 日付: {date}
-- 位置: 緯度 {lat:.2f}°, 経度 {lon:.2f}°
-- CO2濃度: {co2:.2f} ppm
-- 偏差: {deviation:.2f} ppm
-- 異常度: {severity_ja}
-- Zスコア: {zscore:.2f}
+    severity_ja = _SEVERITY_JA.get(severity, severity)
 
-【推論内容】
-この地点でのCO2濃度異常の考えられる原因、その地域の特徴、および環境への影響について、科学的根拠に基づいて分析してください。
-地理的な特性や、その時期の気候的要因も考慮してください。
-"""
-
-    return prompt
+    return _PROMPT_TEMPLATE.format(
+        date=date,
+        lat=lat,
+        lon=lon,
+        co2=co2,
+        deviation=deviation,
+        severity_ja=severity_ja,
+        zscore=zscore
+    )
 
 
 def call_gemini_api(prompt: str, model_name: str = None) -> str:
@@ -105,15 +136,44 @@ def call_gemini_api(prompt: str, model_name: str = None) -> str:
     if model_name is None:
         model_name = os.environ.get('GEMINI_MODEL', 'gemini-2.0-flash-exp')
 
+    global _quota_exceeded_until
+
+    # サーキットブレーカ: クォータ枯渇が確定している間は呼び出さない
+    if time.time() < _quota_exceeded_until:
+        raise GeminiAPIError(
+            "Gemini API quota exceeded; skipping call until cooldown expires."
+        )
+
     try:
-        # APIキーを設定
-        genai.configure(api_key=api_key)
+        # モデルをキャッシュから取得（初回のみ構築）
+        model = _MODEL_CACHE.get((api_key, model_name))
+        if model is None:
+            # 遅延インポート（2回目以降は sys.modules 経由で実質ノーコスト）
+            import google.generativeai as genai
+
+            # APIキーを設定
+            genai.configure(api_key=api_key)
 
-        # モデルを初期化
-        model = genai.GenerativeModel(model_name)
+            # モデルを初期化
+            model = genai.GenerativeModel(model_name)
+            _MODEL_CACHE[(api_key, model_name)] = model
+
+        from google.api_core import exceptions as api_exceptions
 
         # プロンプトを送信
-        response = model.generate_content(prompt)
+        # 429は指数バックオフ（1s, 2s, ...最大60s）で再試行する
+        response = None
+        for attempt in range(_RETRY_ATTEMPTS):
+            try:
+                response = model.generate_content(prompt)
+                break
+            except api_exceptions.ResourceExhausted:
+                if attempt == _RETRY_ATTEMPTS - 1:
+                    # 再試行し尽くした: 一定時間ブレーカを開いて
+                    # 後続の呼び出しが無駄な試行をしないようにする
+                    _quota_exceeded_until = time.time() + _QUOTA_COOLDOWN_SECONDS
+                    raise
+                time.sleep(min(60, 2 ** attempt))
 
         # レスポンスチェック
         if not response or not response.text:
@@ -128,6 +188,27 @@ def call_gemini_api(prompt: str, model_name: str = None) -> str:
             raise GeminiAPIError(f"Failed to call Gemini API: {str(e)}") from e
 
 
+@lru_cache(maxsize=1024)
+def _cached_inference(
+    lat: float,
+    lon: float,
+    co2: float,
+    deviation: float,
+    date: str,
+    severity: str,
+    zscore: float,
+    model_name: Optional[str]
+) -> str:
+    """丸め済みパラメータをキーとした推論結果のインプロセスキャッシュ
+
+    同一格子・同一日付のサイドパネルクリックは同じプロンプトになるため、
+    2回目以降はGeminiへのラウンドトリップ（1〜3秒＋RPMクォータ消費）を
+    丸ごと省略できる。例外はlru_cacheに保存されないので、失敗は再試行される。
+    """
+    prompt = generate_prompt(lat, lon, co2, deviation, date, severity, zscore)
+    return call_gemini_api(prompt, model_name)
+
+
 def generate_inference(
     lat: float,
     lon: float,
@@ -157,8 +238,60 @@ def generate_inference(
     Raises:
         GeminiAPIError: API呼び出しに失敗した場合
     """
-    prompt = generate_prompt(lat, lon, co2, deviation, date, severity, zscore)
-    return call_gemini_api(prompt, model_name)
+    # APIキー未設定時のプレースホルダ文言は例外ではなく戻り値なので、
+    # lru_cacheを経由させると後からキーを設定しても固定文言が返り続ける。
+    # キャッシュ層を迂回して毎回判定させる
+    if not os.environ.get('GEMINI_API_KEY'):
+        prompt = generate_prompt(lat, lon, co2, deviation, date, severity, zscore)
+        return call_gemini_api(prompt, model_name)
+
+    # 浮動小数の表現ゆらぎでキャッシュミスしないよう、プロンプトの
+    # 表示精度（.2f等）に合わせて丸めてからキャッシュを引く
+    return _cached_inference(
+        round(lat, 2), round(lon, 2), round(co2, 1), round(deviation, 1),
+        date, severity, round(zscore, 1), model_name
+    )
+
+
+def generate_inferences_batch(
+    records: List[dict],
+    model_name: str = None,
+    max_concurrency: int = 8
+) -> List[str]:
+    """
+    複数のCO2異常データの推論をまとめて生成する
+
+    1件ずつ直列に呼ぶとGeminiのRPM制限とレイテンシ（1〜3秒/件）が
+    そのまま積み上がるため、スレッドプールで並列に呼び出す。
+    各呼び出しは generate_inference を経由するので、丸めキーによる
+    キャッシュヒット分はAPIを呼ばずに即座に返る。
+
+    Args:
+        records: 推論対象のリスト。各要素は generate_inference と同じ
+            キー（lat, lon, co2, deviation, date, severity, zscore）を持つdict
+        model_name: 使用するGeminiモデル名（デフォルト: 環境変数GEMINI_MODELの値）
+        max_concurrency: 同時リクエスト数の上限
+
+    Returns:
+        List[str]: recordsと同じ順序の推論結果リスト
+
+    Raises:
+        GeminiAPIError: いずれかのAPI呼び出しに失敗した場合
+    """
+    if not records:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [
+            executor.submit(
+                generate_inference,
+                rec['lat'], rec['lon'], rec['co2'], rec['deviation'],
+                rec['date'], rec['severity'], rec['zscore'],
+                model_name
+            )
+            for rec in records
+        ]
+        return [future.result() for future in futures]
 
 
 if __name__ == "__main__":
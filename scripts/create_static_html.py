@@ -1,29 +1,40 @@
 import json
 
+# orjsonがあれば読み書きとも高速化（無ければ標準jsonにフォールバック）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Read anomalies.geojson
-with open('anomalies.geojson', 'r', encoding='utf-8') as f:
-    geojson_data = json.load(f)
+with open('anomalies.geojson', 'rb') as f:
+    raw = f.read()
+geojson_data = orjson.loads(raw) if orjson is not None else json.loads(raw)
 
 # Read sample_simple.html template
 with open('sample_simple.html', 'r', encoding='utf-8') as f:
     html_content = f.read()
 
-# Replace the loadSampleData function with embedded data
-embedded_data_script = f'''    // 埋め込みデータ
-    const embeddedData = {json.dumps(geojson_data, ensure_ascii=False, indent=2)};
+# 埋め込みスクリプトをデータ前後の2チャンクに分けておき、
+# GeoJSON本体はファイルハンドルへ直接書き出す（巨大なHTML文字列を
+# 2回メモリに持たない）。ブラウザ用途にindentは不要なのでminifyする
+script_prefix = '''    // 埋め込みデータ
+    const embeddedData = '''
+
+script_suffix = ''';
 
     // データを読み込んで表示
-    function loadSampleData() {{
-      try {{
+    function loadSampleData() {
+      try {
         updateStatus('CO₂異常値データを読み込み中...');
         console.log('Loaded CO2 anomaly data:', embeddedData.features.length, 'points');
         addCO2DataToMap(embeddedData);
         updateStatus('CO₂異常値データ表示完了 (' + embeddedData.features.length + '地点)');
-      }} catch (error) {{
+      } catch (error) {
         console.error('Failed to load data:', error);
         updateStatus('データ読み込みエラー: ' + error.message);
-      }}
-    }}'''
+      }
+    }'''
 
 # Replace the fetch-based loadSampleData with embedded version
 old_function = '''    // anomalies.geojsonからデータを読み込んで表示
@@ -50,17 +61,28 @@ old_function = '''    // anomalies.geojsonからデータを読み込んで表
       }
     }'''
 
-static_html = html_content.replace(old_function, embedded_data_script)
+# テンプレートを旧関数ブロックで1回だけ分割（全文replaceの再走査を回避）
+before, found, after = html_content.partition(old_function)
+if not found:
+    raise SystemExit('loadSampleData block not found in sample_simple.html')
 
 # Update title to indicate this is the static version
-static_html = static_html.replace(
+before = before.replace(
     '<title>CO₂ 濃度可視化マップ</title>',
     '<title>CO₂ 濃度可視化マップ (Static)</title>'
 )
 
-# Write to sample_static.html
+# Write to sample_static.html（前チャンク → GeoJSON → 後チャンクの順に
+# ストリーム書き出し。結合済みHTML全体を構築しない）
 with open('sample_static.html', 'w', encoding='utf-8') as f:
-    f.write(static_html)
+    f.write(before)
+    f.write(script_prefix)
+    if orjson is not None:
+        f.write(orjson.dumps(geojson_data).decode('utf-8'))
+    else:
+        json.dump(geojson_data, f, ensure_ascii=False, separators=(',', ':'))
+    f.write(script_suffix)
+    f.write(after)
 
 print('Created sample_static.html successfully!')
 print(f'Embedded {len(geojson_data["features"])} features')
@@ -3,18 +3,49 @@ import boto3
 import json
 import requests
 import os
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Earthdataの認証リダイレクトチェーン（4リクエスト）をkeep-aliveで
+# 1回のTCP+TLSハンドシェイクに載せるための共有セッション。
+# 一時的な429/5xxは指数バックオフ付きで自動再試行する
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# ダウンロードの並列数
+# ネットワークI/O待ちが支配的なため、スレッドのファンアウトで
+# 帯域上限までほぼ線形にスケールする
+MAX_WORKERS = 16
+
+# 大きめのオブジェクトはs3transferが16MiB単位のバイトレンジGETで
+# 複数コネクションに分割取得する（S3のベストプラクティス推奨値）。
+# max_concurrencyはLambdaのメモリ上限を考慮して4に抑える
+# （外側のワーカープールと掛け算で同時コネクション数が決まる）
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True
+)
 
 
 def retrieve_credentials(event):
     """Earthdata Loginを通してGESDISCの一時S3認証情報を取得"""
-    login_resp = requests.get(event['s3_endpoint'], allow_redirects=False)
+    login_resp = _SESSION.get(event['s3_endpoint'], allow_redirects=False)
     login_resp.raise_for_status()
 
     # 認証情報をBase64エンコード
     auth = f"{event['edl_username']}:{event['edl_password']}"
     encoded_auth = base64.b64encode(auth.encode('ascii')).decode('ascii')
 
-    auth_redirect = requests.post(
+    auth_redirect = _SESSION.post(
         login_resp.headers['location'],
         data={"credentials": encoded_auth},
         headers={"Origin": event['s3_endpoint']},
@@ -22,8 +53,8 @@ def retrieve_credentials(event):
     )
     auth_redirect.raise_for_status()
 
-    final = requests.get(auth_redirect.headers['location'], allow_redirects=False)
-    results = requests.get(
+    final = _SESSION.get(auth_redirect.headers['location'], allow_redirects=False)
+    results = _SESSION.get(
         event['s3_endpoint'],
         cookies={'accessToken': final.cookies['accessToken']}
     )
@@ -40,6 +71,7 @@ def lambda_handler(event, context):
     prefix = event.get('prefix', 'OCO3_DATA/OCO3_L2_Lite_FP.11r')
 
     # 認証付きS3クライアント
+    # boto3クライアントはスレッドセーフなので全ワーカーで共有する
     s3_client = boto3.client(
         's3',
         aws_access_key_id=creds["accessKeyId"],
@@ -47,49 +79,51 @@ def lambda_handler(event, context):
         aws_session_token=creds["sessionToken"]
     )
 
+    def _download_one(key, tmp_path):
+        """1オブジェクトをダウンロード（ワーカースレッドで実行）"""
+        print(f"Downloading: {key} -> {tmp_path}")
+        # 認証済みクライアントで直接GET（署名付きURLの発行は不要）
+        s3_client.download_file(source_bucket, key, tmp_path,
+                                Config=TRANSFER_CONFIG)
+        return tmp_path
+
     paginator = s3_client.get_paginator('list_objects_v2')
-    page_iterator = paginator.paginate(Bucket=source_bucket, Prefix=prefix)
+    # 1ページ最大の1000キーでリクエスト回数を最小化する
+    page_iterator = paginator.paginate(
+        Bucket=source_bucket, Prefix=prefix,
+        PaginationConfig={'PageSize': 1000}
+    )
 
     downloaded_files = []
+    futures = []
 
-    for page in page_iterator:
-        if "Contents" not in page:
-            continue
-
-        for obj in page["Contents"]:
-            key = obj["Key"]
-            filename = os.path.basename(key)
-
-            # ディレクトリが空（prefixフォルダ自体など）はスキップ
-            if not filename:
+    # ページを読みながら順次submitする（プロデューサ・コンシューマ型）。
+    # 次ページのListObjectsV2と前ページ分のダウンロードが重なって進む
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for page in page_iterator:
+            if "Contents" not in page:
                 continue
 
-            tmp_path = f"/tmp/{filename}"
-
-            # ファイルが既に存在する場合はダウンロードをスキップ
-            if os.path.exists(tmp_path):
-                print(f"File already exists, skipping download: {tmp_path}")
-                downloaded_files.append(tmp_path)
-                continue
+            for obj in page["Contents"]:
+                key = obj["Key"]
+                filename = os.path.basename(key)
 
-            print(f"Downloading: {key} -> {tmp_path}")
+                # ディレクトリが空（prefixフォルダ自体など）はスキップ
+                if not filename:
+                    continue
 
-            # 署名付きURL生成
-            url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': source_bucket, 'Key': key},
-                ExpiresIn=3600
-            )
+                tmp_path = f"/tmp/{filename}"
 
-            # ダウンロード実行
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
+                # ファイルが既に存在する場合はダウンロードをスキップ
+                if os.path.exists(tmp_path):
+                    print(f"File already exists, skipping download: {tmp_path}")
+                    downloaded_files.append(tmp_path)
+                    continue
 
-            with open(tmp_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+                futures.append(executor.submit(_download_one, key, tmp_path))
 
-            downloaded_files.append(tmp_path)
+        for future in futures:
+            downloaded_files.append(future.result())
 
     return {
         "statusCode": 200,
@@ -1,45 +1,58 @@
 import netCDF4 as nc
 import numpy as np
-import itertools
 
 # netCDF ファイルを読み込み
-ds = nc.Dataset("test.nc4")
-
-# 緯度
-lat = ds.variables['latitude'][:]
-# 経度
-lon = ds.variables['longitude'][:]
-# 平均Co2濃度
-xco2 = ds.variables['xco2'][:]
+with nc.Dataset("test.nc4") as ds:
+    # 緯度
+    lat = np.ma.filled(ds.variables['latitude'][:], np.nan)
+    # 経度
+    lon = np.ma.filled(ds.variables['longitude'][:], np.nan)
+    # 平均Co2濃度
+    xco2 = np.ma.filled(ds.variables['xco2'][:], np.nan)
 
 # 格子分割レベル（1°×1°）
 LL = 1.0
 
-# 格子分割
-lat_grid = np.arange(lat.min(), lat.max(), LL)
-lon_grid = np.arange(lon.min(), lon.max(), LL)
-
-# generator関数で格子平均を逐次生成
-def gen_grid_averages():
-    for lat_min, lon_min in itertools.product(lat_grid, lon_grid):
- 
-        lat_max = lat_min + LL
-        lon_max = lon_min + LL
-        lat_mask = (lat >= lat_min) & (lat < lat_max)
-        lon_mask = (lon >= lon_min) & (lon < lon_max)
-        # 格子範囲でマスク（取得）
-        mask = lat_mask & lon_mask
-        subset = xco2[mask]
-        if subset.size == 0:
-            continue
-
-        # gen_gridを返答
-        yield {'lat_min': lat_min, 'lat_max': lat_max,
-               'lon_min': lon_min, 'lon_max': lon_max,
-               'avg_co2': np.nanmean(subset)}
-
-# generator を使って全格子平均を計算し、上位10格子を抽出
-top10 = sorted(gen_grid_averages(), key=lambda x: x['avg_co2'], reverse=True)[:10]
+# 格子原点と格子数（等間隔格子なので原点と格子数だけ持てばよい）
+lat_min0 = float(np.floor(np.nanmin(lat)))
+lat_max0 = float(np.ceil(np.nanmax(lat)))
+lon_min0 = float(np.floor(np.nanmin(lon)))
+lon_max0 = float(np.ceil(np.nanmax(lon)))
+nlat = int(round((lat_max0 - lat_min0) / LL))
+nlon = int(round((lon_max0 - lon_min0) / LL))
+
+# 欠損値と範囲外を1つのマスクで除外
+# （旧実装は格子ごとに全点マスクを取り直す O(格子数×点数) の二重ループだった。
+#   ここでは analyze_geojson と同じ O(点数) のbincount集計に置き換えている）
+mask = (np.isfinite(xco2)
+        & (lat >= lat_min0) & (lat < lat_max0)
+        & (lon >= lon_min0) & (lon < lon_max0))
+lat_idx = ((lat[mask] - lat_min0) / LL).astype(np.int64)
+lon_idx = ((lon[mask] - lon_min0) / LL).astype(np.int64)
+xco2_valid = xco2[mask]
+
+# 格子ごとの合計とカウントを1パスで集計し平均を算出
+flat_idx = lat_idx * nlon + lon_idx
+grid_sum = np.bincount(flat_idx, weights=xco2_valid.astype(np.float64, copy=False),
+                       minlength=nlat * nlon)
+grid_count = np.bincount(flat_idx, minlength=nlat * nlon)
+with np.errstate(divide='ignore', invalid='ignore'):
+    grid_avg = np.where(grid_count > 0, grid_sum / grid_count, np.nan)
+
+# 有効な格子から上位10格子を抽出（全体ソートではなくargpartition）
+valid_flat = np.where(grid_count > 0)[0]
+valid_values = grid_avg[valid_flat]
+top_n = min(10, valid_values.size)
+top_idx = np.argpartition(valid_values, -top_n)[-top_n:]
+top_idx = top_idx[np.argsort(valid_values[top_idx])[::-1]]
+
+top10 = []
+for idx in top_idx:
+    cell = valid_flat[idx]
+    i, j = divmod(int(cell), nlon)
+    top10.append({'lat_min': lat_min0 + i * LL, 'lat_max': lat_min0 + (i + 1) * LL,
+                  'lon_min': lon_min0 + j * LL, 'lon_max': lon_min0 + (j + 1) * LL,
+                  'avg_co2': float(valid_values[idx])})
 
 # 5. 結果表示
 for i, g in enumerate(top10, 1):
@@ -1,16 +1,20 @@
 """
-Simple test to verify inference display works
+Manual smoke check for the inference display (not an automated test)
+
+Opens sample_calendar.html in a visible browser and waits for a human to
+click through the flow. Lives under scripts/ so pytest collection and CI
+never spend a minute idling in it; the automated equivalents are
+tests/test_quick.py (cache flow) and tests/e2e_test.py (full UI).
 """
 
 import asyncio
 import sys
-import io
 from playwright.async_api import async_playwright
 
 # Fix Windows console encoding issues
 if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
 
 
 async def main():
@@ -37,8 +41,8 @@ async def main():
         print("4. Check if '（キャッシュ）' appears on second click")
         print("\nPress Enter when done...")
 
-        # Keep browser open
-        await page.wait_for_timeout(60000)  # Wait 60 seconds
+        # Actually wait for Enter instead of a blind 60-second timer
+        await asyncio.get_running_loop().run_in_executor(None, input)
 
         print("Taking final screenshot...")
         await page.screenshot(path='screenshot_02_final.png')
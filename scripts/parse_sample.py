@@ -1,29 +1,45 @@
 import json
 
+# orjsonがあればパース・整形出力とも高速化（無ければ標準jsonへフォールバック）
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+except ImportError:
+    orjson = None
+
+    def _loads(data):
+        return json.loads(data)
+
 def parse_sample_json():
     """sample.jsonを読み込み、bodyのJSONをパースして整形したファイルを出力"""
 
-    # sample.jsonを読み込む
-    with open('sample.json', 'r', encoding='utf-8') as f:
+    # sample.jsonを読み込む（両デコーダともUTF-8バイト列を直接受け付ける）
+    with open('sample.json', 'rb') as f:
         content = f.read()
 
     # JSON全体をパース
-    data = json.loads(content)
+    data = _loads(content)
 
     # bodyのJSON文字列を取得してパース
     if isinstance(data, dict) and 'body' in data:
         body_str = data['body']
-        body_data = json.loads(body_str)
+        body_data = _loads(body_str)
     elif isinstance(data, str):
         # dataが文字列の場合は直接パース
-        body_data = json.loads(data)
+        body_data = _loads(data)
     else:
         # すでにGeoJSON形式の場合
         body_data = data
 
     # 整形してparse_sample.jsonに出力
-    with open('parse_sample.json', 'w', encoding='utf-8') as f:
-        json.dump(body_data, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        with open('parse_sample.json', 'wb') as f:
+            f.write(orjson.dumps(body_data, option=orjson.OPT_INDENT_2))
+    else:
+        with open('parse_sample.json', 'w', encoding='utf-8') as f:
+            json.dump(body_data, f, indent=2, ensure_ascii=False)
 
     # 結果を表示
     print("OK sample.json was parsed successfully")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+pytest共通フィクスチャ（Playwrightブラウザの共有）
+
+chromium.launch()は1回あたり1〜2秒のコールドスタートを伴うため、
+ブラウザはセッションスコープで1プロセスにつき1回だけ起動して
+全テストで共有する。コンテキストとページはテストごとに作り直し、
+クッキー・localStorage等の状態がテスト間に漏れないようにする。
+"""
+
+import http.server
+import os
+
+import pytest
+
+# テストから起動する子プロセス（Flaskサーバー等）にもUTF-8出力を
+# 継承させる。各テストファイルで個別にstdoutを包み直す必要がなくなる
+os.environ.setdefault("PYTHONIOENCODING", "utf-8")
+
+
+@pytest.fixture(scope="session")
+def browser():
+    """セッション全体で共有するヘッドレスChromium"""
+    # playwright未インストール環境では依存テストごとスキップする
+    # （コレクション時にImportErrorで全体を落とさない）
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        yield browser
+        browser.close()
+
+
+@pytest.fixture
+def context(browser):
+    """テストごとに独立したブラウザコンテキスト（1280x720）"""
+    ctx = browser.new_context(viewport={"width": 1280, "height": 720})
+    yield ctx
+    ctx.close()
+
+
+@pytest.fixture
+def page(context):
+    """テストごとの新規ページ"""
+    page = context.new_page()
+    yield page
+    page.close()
+
+
+class _CachedStaticHandler(http.server.SimpleHTTPRequestHandler):
+    """(path, mtime) -> bytes をメモ化する静的ファイルハンドラ
+
+    Playwrightは1テスト内で同じHTML/JSを何度も読み込むため、
+    リクエストごとのstat+readをプロセス内キャッシュで省く。
+    mtimeが変わればキャッシュは自動的に無効化される。
+    dictの読み書きはGIL下でアトミックなのでスレッドサーバーでも安全。
+    """
+
+    protocol_version = "HTTP/1.1"
+    _cache = {}
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isdir(path):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime is not None:
+                cached = self._cache.get(path)
+                if cached is None or cached[0] != mtime:
+                    with open(path, "rb") as f:
+                        cached = (mtime, f.read())
+                    self._cache[path] = cached
+                body = cached[1]
+                self.send_response(200)
+                self.send_header("Content-Type", self.guess_type(path))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        # ディレクトリ一覧や404は標準実装に任せる
+        super().do_GET()
+
+    def log_message(self, *_args):
+        # リクエストごとのstderr出力は高頻度アクセスでは無視できない
+        pass
+
+
+@pytest.fixture(scope="session")
+def http_server():
+    """セッション全体で共有する静的ファイル配信サーバー
+
+    ポート0でバインドして空きポートをOSに選ばせるため、固定ポートの
+    衝突（TIME_WAIT含む）が起きず、xdistの並列ワーカーでも安全。
+    コンストラクタの時点でlistenまで完了しているので起動待ちも不要。
+    テストはyieldされるベースURL（例: http://127.0.0.1:54321）を使う。
+
+    ThreadingHTTPServerなのでブラウザの並列アセット取得が
+    直列化されず、HTTP/1.1のkeep-aliveでリクエストごとの
+    TCPハンドシェイクも省ける。配信は_CachedStaticHandlerが
+    メモリキャッシュから行う。
+    """
+    import threading
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), _CachedStaticHandler
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=2)
+
+
+@pytest.fixture(scope="session")
+def http_session():
+    """セッション全体で共有するHTTP接続プール
+
+    APIテストは全て同じFlaskサーバーを叩くため、keep-alive接続を
+    使い回してテストごとのTCPハンドシェイクを省く。
+    """
+    requests = pytest.importorskip("requests")
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    yield session
+    session.close()
@@ -12,36 +12,75 @@ Task 3 Completion Criteria Test
 4. APIエラー時の適切な例外処理
 """
 
+import io
 import os
 import sys
+import threading
 import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+# pytestから収集された場合はassert/skipで結果を伝え、スクリプト実行時は
+# main()が戻り値とAssertionErrorを集計する（pytest無しでも動く）
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+
+class _ThreadLocalStdout:
+    """スレッドごとにprint出力をバッファへ振り分けるstdoutプロキシ
+
+    並行実行するテストの出力が混線しないよう、各ワーカースレッドは
+    自分のStringIOに書き、バッファ未設定のスレッド（メインスレッド）は
+    素のstdoutへ素通しする
+    """
+
+    def __init__(self, target):
+        self._target = target
+        self._local = threading.local()
+
+    def set_buffer(self, buf):
+        self._local.buf = buf
+
+    def write(self, text):
+        buf = getattr(self._local, 'buf', None)
+        (buf if buf is not None else self._target).write(text)
+
+    def flush(self):
+        buf = getattr(self._local, 'buf', None)
+        (buf if buf is not None else self._target).flush()
 
 
 def test_1_file_exists():
     """Test 1: ファイルの存在確認"""
     print("Test 1: File existence check")
 
-    if os.path.exists("gemini_client.py"):
+    exists = os.path.exists("gemini_client.py")
+    if exists:
         print("  [PASSED] gemini_client.py exists")
-        return True
     else:
         print("  [FAILED] gemini_client.py not found")
-        return False
+    if not exists:
+        raise AssertionError("gemini_client.py not found")
+    return True
 
 
 def test_2_syntax_check():
     """Test 2: 構文チェック"""
     print("\nTest 2: Syntax check")
 
-    import py_compile
+    import pathlib
 
     try:
-        py_compile.compile("gemini_client.py", doraise=True)
+        # メモリ内compile()で構文だけ検証する。py_compileのように
+        # __pycache__へ.pycを書き出さないため、ディスクI/Oが発生しない
+        src = pathlib.Path("gemini_client.py").read_bytes()
+        compile(src, "gemini_client.py", "exec")
         print("  [OK] PASSED: No syntax errors")
         return True
-    except py_compile.PyCompileError as e:
+    except SyntaxError as e:
         print(f"  [X] FAILED: Syntax error: {e}")
-        return False
+        raise AssertionError(f"Syntax error in gemini_client.py: {e}")
 
 
 def test_3_function_imports():
@@ -59,16 +98,20 @@ def test_3_function_imports():
         print("  [OK] PASSED: All required functions can be imported")
 
         # 関数のシグネチャ確認
+        # inspect.signature()は__wrapped__や注釈の解決まで行う高コストな
+        # 構築なので、表示用の1回だけに留め、引数名チェックはコード
+        # オブジェクトから直接読む
         print("\n  Function signatures:")
 
         # load_api_key()
-        sig = inspect.signature(load_api_key)
-        print(f"    load_api_key{sig}")
+        code = load_api_key.__code__
+        print(f"    load_api_key({', '.join(code.co_varnames[:code.co_argcount])})")
 
         # generate_prompt()
         sig = inspect.signature(generate_prompt)
         print(f"    generate_prompt{sig}")
-        params = list(sig.parameters.keys())
+        gp_code = generate_prompt.__code__
+        params = list(gp_code.co_varnames[:gp_code.co_argcount])
         expected_params = ['lat', 'lon', 'co2', 'deviation', 'date', 'severity', 'zscore']
         if params == expected_params:
             print("      [OK] Correct parameters")
@@ -76,14 +119,14 @@ def test_3_function_imports():
             print(f"      ! Parameters: {params}")
 
         # call_gemini_api()
-        sig = inspect.signature(call_gemini_api)
-        print(f"    call_gemini_api{sig}")
+        cg_code = call_gemini_api.__code__
+        print(f"    call_gemini_api({', '.join(cg_code.co_varnames[:cg_code.co_argcount])})")
 
         return True
 
     except ImportError as e:
         print(f"  [X] FAILED: Import error: {e}")
-        return False
+        raise AssertionError(f"Import error: {e}")
 
 
 def test_4_api_key_loading():
@@ -100,20 +143,29 @@ def test_4_api_key_loading():
     try:
         load_api_key()
         print("  [X] FAILED: Should have raised GeminiAPIError")
-        return False
+        raise AssertionError("load_api_key() should raise GeminiAPIError without a key")
     except GeminiAPIError as e:
         print(f"  [OK] PASSED: GeminiAPIError raised correctly")
         print(f"    Error message: {e}")
         return True
-    except Exception as e:
-        print(f"  [X] FAILED: Wrong exception type: {type(e).__name__}")
-        return False
     finally:
         # 元の値を復元
         if original_key:
             os.environ['GEMINI_API_KEY'] = original_key
 
 
+# プロンプトに含まれるべき要素（モジュール読み込み時に1回だけ構築する
+# フラットなタプル。テストごとのdict/list割り当てを避ける）
+_REQUIRED_PROMPT_ELEMENTS = (
+    ("緯度", ("35.68", "35.7")),
+    ("経度", ("139.65", "139.7")),
+    ("CO2濃度", ("420.5", "420.50")),
+    ("偏差", ("5.2", "5.20")),
+    ("日付", ("2023-01-15",)),
+    ("Zスコア", ("2.8", "2.80")),
+)
+
+
 def test_5_prompt_generation():
     """Test 5: プロンプト生成テスト"""
     print("\nTest 5: Prompt generation test")
@@ -137,18 +189,9 @@ def test_5_prompt_generation():
         print(f"  [OK] Prompt generated successfully")
         print(f"    Length: {len(prompt)} characters")
 
-        # 必要な要素が含まれているか確認
-        required_elements = {
-            "緯度": ["35.68", "35.7"],
-            "経度": ["139.65", "139.7"],
-            "CO2濃度": ["420.5", "420.50"],
-            "偏差": ["5.2", "5.20"],
-            "日付": ["2023-01-15"],
-            "Zスコア": ["2.8", "2.80"],
-        }
-
+        # 必要な要素が含まれているか確認（定数タプルをそのまま走査）
         all_found = True
-        for element_name, possible_values in required_elements.items():
+        for element_name, possible_values in _REQUIRED_PROMPT_ELEMENTS:
             found = any(val in prompt for val in possible_values)
             if found:
                 print(f"    [OK] Contains {element_name}")
@@ -158,16 +201,19 @@ def test_5_prompt_generation():
 
         if all_found:
             print("  [OK] PASSED: All required elements present in prompt")
-            return True
         else:
             print("  [X] FAILED: Some required elements missing")
-            return False
+        if not all_found:
+            raise AssertionError("Some required elements missing from prompt")
+        return True
 
+    except AssertionError:
+        raise
     except Exception as e:
         print(f"  [X] FAILED: {e}")
         import traceback
         traceback.print_exc()
-        return False
+        raise AssertionError(f"Prompt generation failed: {e}")
 
 
 def test_6_api_call_structure():
@@ -185,7 +231,8 @@ def test_6_api_call_structure():
         print(f"  [OK] call_gemini_api has 'prompt' parameter")
     else:
         print(f"  [X] call_gemini_api missing 'prompt' parameter")
-        return False
+    if 'prompt' not in params:
+        raise AssertionError("call_gemini_api missing 'prompt' parameter")
 
     # エラーハンドリングのテスト（無効なAPIキー）
     original_key = os.environ.get('GEMINI_API_KEY')
@@ -218,6 +265,8 @@ def test_7_integration():
     if not api_key or api_key == 'invalid_test_key_12345':
         print("  [SKIP] SKIPPED: GEMINI_API_KEY not set")
         print("    Set GEMINI_API_KEY environment variable to run this test")
+        if pytest is not None and 'PYTEST_CURRENT_TEST' in os.environ:
+            pytest.skip("GEMINI_API_KEY not set")
         return None  # スキップ
 
     from gemini_client import generate_inference
@@ -256,7 +305,7 @@ def test_7_integration():
         print(f"  [X] FAILED: {e}")
         import traceback
         traceback.print_exc()
-        return False
+        raise AssertionError(f"Integration test failed: {e}")
 
 
 def main():
@@ -266,26 +315,59 @@ def main():
     print("Task 3: Gemini API Client - Completion Criteria Test")
     print("=" * 70)
 
-    tests = [
+    # テスト1/2/3/5は共有状態を持たない純粋なローカル検査なので並行実行
+    # できる。テスト4/6/7はGEMINI_API_KEYを書き換えるため直列のまま
+    parallel_tests = [
         test_1_file_exists,
         test_2_syntax_check,
         test_3_function_imports,
-        test_4_api_key_loading,
         test_5_prompt_generation,
+    ]
+    serial_tests = [
+        test_4_api_key_loading,
         test_6_api_call_structure,
         test_7_integration,
     ]
 
-    results = []
-    for test_func in tests:
+    def run_test(test_func):
         try:
-            result = test_func()
-            results.append((test_func.__name__, result))
+            return test_func()
+        except AssertionError as e:
+            # テスト本体が既に失敗理由を出力済みなのでメッセージだけ
+            print(f"\n  [X] FAILED: {e}")
+            return False
         except Exception as e:
             print(f"\n  [X] EXCEPTION: {e}")
             import traceback
             traceback.print_exc()
-            results.append((test_func.__name__, False))
+            return False
+
+    def run_test_buffered(test_func):
+        """ワーカースレッド用: 出力を自前のバッファに貯めて返す"""
+        buf = io.StringIO()
+        proxy.set_buffer(buf)
+        try:
+            return run_test(test_func), buf.getvalue()
+        finally:
+            proxy.set_buffer(None)
+
+    results = []
+
+    original_stdout = sys.stdout
+    proxy = _ThreadLocalStdout(original_stdout)
+    sys.stdout = proxy
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for test_func, (result, output) in zip(
+                parallel_tests, executor.map(run_test_buffered, parallel_tests)
+            ):
+                sys.stdout.write(output)
+                results.append((test_func.__name__, result))
+    finally:
+        sys.stdout = original_stdout
+
+    for test_func in serial_tests:
+        results.append((test_func.__name__, run_test(test_func)))
 
     # サマリー
     print("\n" + "=" * 70)
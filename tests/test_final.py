@@ -4,13 +4,12 @@ Final comprehensive test with detailed logging
 
 import asyncio
 import sys
-import io
 from playwright.async_api import async_playwright
 
 # Fix Windows console encoding issues
 if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
 
 
 async def main():
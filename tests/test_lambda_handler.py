@@ -1,55 +1,176 @@
 """
 Unit tests for Lambda handler
 Tests the reasoning API Lambda function migrated from Flask app.py
+
+All tests are pure CPU and independent (AWS/Bedrock are stubbed at
+module scope, so each xdist worker gets its own isolated copy), which
+makes them safe to parallelize:
+
+    pytest -n auto tests/test_lambda_handler.py
+
+Also runnable directly (python tests/test_lambda_handler.py) without
+pytest installed; main() is kept for that path only.
 """
 
 import json
+import re
 import sys
 import os
 import hashlib
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Set UTF-8 encoding for Windows console
+# Set UTF-8 encoding for Windows console (in-place reconfigure keeps the
+# fast C-buffered writer instead of adding a StreamWriter layer per print)
 if sys.platform == 'win32':
-    import codecs
-    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
-    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
 
 # Add the lambda handler directory to the path
 lambda_dir = os.path.join(os.path.dirname(__file__), '..', 'cdk', 'lambda', 'reasoning-handler')
 sys.path.insert(0, lambda_dir)
 
 # Mock environment variables before importing the module
-os.environ['DYNAMODB_TABLE_NAME'] = 'test-cache-table'
-os.environ['GEMINI_API_KEY_SECRET_NAME'] = 'test-api-key-secret'
-os.environ['CACHE_TTL_DAYS'] = '90'
-os.environ['GEMINI_MODEL'] = 'gemini-2.0-flash-exp'
-os.environ['ENVIRONMENT'] = 'test'
-os.environ['LOG_LEVEL'] = 'INFO'
-os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'  # Add AWS region for boto3
+# (one dict merge instead of seven per-key putenv round-trips)
+os.environ.update({
+    'DYNAMODB_TABLE_NAME': 'test-cache-table',
+    'GEMINI_API_KEY_SECRET_NAME': 'test-api-key-secret',
+    'CACHE_TTL_DAYS': '90',
+    'GEMINI_MODEL': 'gemini-2.0-flash-exp',
+    'ENVIRONMENT': 'test',
+    'LOG_LEVEL': 'INFO',
+    'AWS_DEFAULT_REGION': 'us-east-1',  # AWS region for boto3
+})
+
+# Stub boto3/botocore before importing index to avoid AWS credential
+# issues. Plain classes instead of MagicMock: every attribute access on a
+# MagicMock allocates and caches a child mock, while these stubs are
+# fixed no-op objects (and none of these tests assert on AWS calls)
+import types
+
+
+class _ClientStub:
+    """No-op AWS client: any method call returns an empty dict"""
+
+    def __getattr__(self, _name):
+        def _noop(*_args, **_kwargs):
+            return {}
+        return _noop
+
+
+class _TypeCodecStub:
+    """Identity stand-in for DynamoDB Type(De)serializer"""
+
+    def serialize(self, value):
+        return value
+
+    def deserialize(self, value):
+        return value
+
+
+class _ConfigStub:
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+
+def _stub_module(name, **attrs):
+    module = types.ModuleType(name)
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    return module
+
+
+_stub_module('boto3',
+             client=lambda *_a, **_k: _ClientStub(),
+             resource=lambda *_a, **_k: _ClientStub(),
+             Session=lambda *_a, **_k: _ClientStub())
+_stub_module('boto3.dynamodb')
+_stub_module('boto3.dynamodb.types',
+             TypeDeserializer=_TypeCodecStub,
+             TypeSerializer=_TypeCodecStub)
+_stub_module('botocore')
+_stub_module('botocore.config', Config=_ConfigStub)
+
+# Base request payload shared by the validation tests; build events as
+# deltas against it instead of re-typing (and re-serializing) the same
+# seven fields in every test
+_BASE_PAYLOAD = {
+    'lat': 35.6762,
+    'lon': 139.6503,
+    'co2': 420.5,
+    'deviation': 5.2,
+    'date': '2025-01-15',
+    'severity': 'high',
+    'zscore': 2.8,
+}
+
+
+# Required Japanese phrases, checked with one compiled-alternation pass
+# instead of seven separate linear 'in' scans over the prompt
+_REQUIRED_PROMPT_PHRASES = (
+    '以下のCO2濃度異常データについて',
+    '観測データ',
+    '推論内容',
+    '日付: 2025-01-15',
+    '緯度 35.68°',
+    'CO2濃度: 420.50 ppm',
+    '異常度: 高',
+)
+_PROMPT_PHRASE_RE = re.compile(
+    '|'.join(re.escape(phrase) for phrase in _REQUIRED_PROMPT_PHRASES))
+
+# Reused across the three severity-mapping invocations
+_SEVERITY_RE = re.compile('異常度: (高|中|低)')
+
+
+class _BedrockStub:
+    """Minimal Converse-API stand-in: records the prompt, returns canned text.
+
+    A plain class instead of MagicMock - reading attributes on a MagicMock
+    allocates child mocks and tracks calls, none of which these tests use.
+    """
+
+    def __init__(self, text='テスト推論結果'):
+        self.response = SimpleNamespace(text=text)
+        self.last_prompt = None
+
+    def converse(self, modelId=None, messages=None, inferenceConfig=None):
+        self.last_prompt = messages[0]['content'][0]['text']
+        return {'output': {'message': {'content': [{'text': self.response.text}]}}}
+
+
+def _event(**overrides):
+    """Build an API Gateway proxy event from _BASE_PAYLOAD plus overrides.
+
+    Passing key=None removes that field (for missing-field tests).
+    """
+    payload = {**_BASE_PAYLOAD, **overrides}
+    for key in [k for k, v in payload.items() if v is None]:
+        del payload[key]
+    return {'body': json.dumps(payload)}
+
 
-# Mock boto3 before importing index to avoid AWS credential issues
-import unittest.mock as mock
-sys.modules['boto3'] = mock.MagicMock()
+# Import once at module scope (after the env vars and module mocks above
+# are in place): every test used to repeat `import index`, paying the
+# sys.modules lookup and re-reading the local name per test
+import index
 
 
 def test_cache_key_generation():
-    """Test 1: SHA256 cache key generation"""
+    """Test 1: BLAKE2b cache key generation"""
     print("\n=== Test 1: Cache Key Generation ===")
 
-    # Import after setting environment variables
-    import index
-
     lat = 35.6762
     lon = 139.6503
     date = "2025-01-15"
 
     cache_key = index.generate_cache_key(lat, lon, date)
 
-    # Verify it's a SHA256 hash (64 hex characters)
-    assert len(cache_key) == 64, "SHA256 hash should be 64 characters"
+    # Verify it's a BLAKE2b hash (digest_size=16 -> 32 hex characters)
+    assert len(cache_key) == 32, "BLAKE2b hash should be 32 characters"
     assert all(c in '0123456789abcdef' for c in cache_key), "Hash should be hex"
-    print(f"✓ Generated valid SHA256 hash: {cache_key[:16]}...")
+    print(f"✓ Generated valid BLAKE2b hash: {cache_key[:16]}...")
 
     # Verify consistency
     cache_key2 = index.generate_cache_key(lat, lon, date)
@@ -66,8 +187,6 @@ def test_cache_key_format_matches_flask():
     """Test 2: Verify cache key format matches Flask cache_manager.py"""
     print("\n=== Test 2: Cache Key Matches Flask Format ===")
 
-    import index
-
     lat = 35.6762
     lon = 139.6503
     date = "2025-01-15"
@@ -76,8 +195,8 @@ def test_cache_key_format_matches_flask():
     lambda_key = index.generate_cache_key(lat, lon, date)
 
     # Generate using same logic as Flask cache_manager.py
-    key_string = f"{lat}_{lon}_{date}"
-    flask_key = hashlib.sha256(key_string.encode('utf-8')).hexdigest()
+    key_string = f"{lat:.4f}_{lon:.4f}_{date}"
+    flask_key = hashlib.blake2b(key_string.encode('utf-8'), digest_size=16).hexdigest()
 
     # Should match exactly
     assert lambda_key == flask_key, "Lambda key should match Flask key format"
@@ -89,106 +208,57 @@ def test_missing_required_fields():
     """Test 3: Missing required fields return 400 error"""
     print("\n=== Test 3: Missing Required Fields Validation ===")
 
-    import index
-
-    # Mock boto3 to avoid AWS calls
-    with patch('index.boto3'):
-        # Event missing 'severity' field
-        event = {
-            'body': json.dumps({
-                'lat': 35.6762,
-                'lon': 139.6503,
-                'co2': 420.5,
-                'deviation': 5.2,
-                'date': '2025-01-15',
-                # 'severity': 'high',  # Missing!
-                'zscore': 2.8
-            })
-        }
+    # Event missing 'severity' field
+    event = _event(severity=None)
 
-        response = index.lambda_handler(event, None)
+    response = index.lambda_handler(event, None)
 
-        assert response['statusCode'] == 400, "Should return 400 for missing fields"
-        body = json.loads(response['body'])
-        assert 'error' in body, "Response should contain error"
-        assert body['error'] == 'Missing required fields', "Correct error message"
-        assert 'severity' in body['missing_fields'], "Should list missing field"
-        print("✓ Missing required fields validation works")
-        print(f"  Missing fields: {body['missing_fields']}")
+    assert response['statusCode'] == 400, "Should return 400 for missing fields"
+    body = json.loads(response['body'])
+    assert 'error' in body, "Response should contain error"
+    assert body['error'] == 'Missing required fields', "Correct error message"
+    assert 'severity' in body['missing_fields'], "Should list missing field"
+    print("✓ Missing required fields validation works")
+    print(f"  Missing fields: {body['missing_fields']}")
 
 
 def test_invalid_severity_value():
     """Test 4: Invalid severity values return 400 error"""
     print("\n=== Test 4: Invalid Severity Value Validation ===")
 
-    import index
-
-    with patch('index.boto3'):
-        event = {
-            'body': json.dumps({
-                'lat': 35.6762,
-                'lon': 139.6503,
-                'co2': 420.5,
-                'deviation': 5.2,
-                'date': '2025-01-15',
-                'severity': 'invalid',  # Invalid value
-                'zscore': 2.8
-            })
-        }
+    event = _event(severity='invalid')
 
-        response = index.lambda_handler(event, None)
+    response = index.lambda_handler(event, None)
 
-        assert response['statusCode'] == 400, "Should return 400 for invalid severity"
-        body = json.loads(response['body'])
-        assert body['error'] == 'Invalid severity value', "Correct error message"
-        assert 'high, medium, low' in body['message'], "Should list valid values"
-        print("✓ Invalid severity validation works")
-        print(f"  Error message: {body['message']}")
+    assert response['statusCode'] == 400, "Should return 400 for invalid severity"
+    body = json.loads(response['body'])
+    assert body['error'] == 'Invalid severity value', "Correct error message"
+    assert 'high, medium, low' in body['message'], "Should list valid values"
+    print("✓ Invalid severity validation works")
+    print(f"  Error message: {body['message']}")
 
 
 def test_invalid_parameter_type():
     """Test 5: Invalid parameter types return 400 error"""
     print("\n=== Test 5: Invalid Parameter Type Validation ===")
 
-    import index
-
-    with patch('index.boto3'):
-        event = {
-            'body': json.dumps({
-                'lat': 'not-a-number',  # Invalid type
-                'lon': 139.6503,
-                'co2': 420.5,
-                'deviation': 5.2,
-                'date': '2025-01-15',
-                'severity': 'high',
-                'zscore': 2.8
-            })
-        }
+    event = _event(lat='not-a-number')
 
-        response = index.lambda_handler(event, None)
+    response = index.lambda_handler(event, None)
 
-        assert response['statusCode'] == 400, "Should return 400 for invalid type"
-        body = json.loads(response['body'])
-        assert body['error'] == 'Invalid parameter type', "Correct error message"
-        print("✓ Invalid parameter type validation works")
+    assert response['statusCode'] == 400, "Should return 400 for invalid type"
+    body = json.loads(response['body'])
+    assert body['error'] == 'Invalid parameter type', "Correct error message"
+    print("✓ Invalid parameter type validation works")
 
 
 def test_japanese_prompt_generation():
     """Test 6: Japanese prompt generation matches Flask gemini_client.py"""
     print("\n=== Test 6: Japanese Prompt Generation ===")
 
-    import index
-
-    with patch('index.genai') as mock_genai, \
-         patch('index.get_gemini_api_key', return_value='test-api-key'):
-
-        mock_response = MagicMock()
-        mock_response.text = 'テスト推論結果'
-        mock_model = MagicMock()
-        mock_model.generate_content.return_value = mock_response
-        mock_genai.GenerativeModel.return_value = mock_model
-
-        reasoning = index.generate_reasoning_with_gemini(
+    stub = _BedrockStub()
+    with patch.object(index, 'bedrock_client', stub):
+        reasoning = index.generate_reasoning_with_bedrock(
             lat=35.6762,
             lon=139.6503,
             co2=420.5,
@@ -198,138 +268,72 @@ def test_japanese_prompt_generation():
             zscore=2.8
         )
 
-        # Verify the prompt contains Japanese text
-        call_args = mock_model.generate_content.call_args
-        prompt = call_args[0][0]
+    # Verify the prompt contains Japanese text
+    prompt = stub.last_prompt
 
-        assert '以下のCO2濃度異常データについて' in prompt, "Should have Japanese intro"
-        assert '観測データ' in prompt, "Should have observation data section"
-        assert '推論内容' in prompt, "Should have reasoning section"
-        assert '日付: 2025-01-15' in prompt, "Should include date"
-        assert '緯度 35.68°' in prompt, "Should include latitude"
-        assert 'CO2濃度: 420.50 ppm' in prompt, "Should include CO2"
-        assert '異常度: 高' in prompt, "Should map 'high' to '高'"
+    missing = set(_REQUIRED_PROMPT_PHRASES) - set(_PROMPT_PHRASE_RE.findall(prompt))
+    assert not missing, f"Prompt is missing required phrases: {sorted(missing)}"
+    assert reasoning == 'テスト推論結果', "Should return the model's text"
 
-        print("✓ Japanese prompt generation works correctly")
-        print(f"  Reasoning result: {reasoning}")
+    print("✓ Japanese prompt generation works correctly")
+    print(f"  Reasoning result: {reasoning}")
 
 
 def test_severity_mapping_to_japanese():
     """Test 7: Severity value mapping to Japanese"""
     print("\n=== Test 7: Severity Mapping to Japanese ===")
 
-    import index
-
-    with patch('index.genai') as mock_genai, \
-         patch('index.get_gemini_api_key', return_value='test-api-key'):
-
-        mock_response = MagicMock()
-        mock_response.text = 'テスト'
-        mock_model = MagicMock()
-        mock_model.generate_content.return_value = mock_response
-        mock_genai.GenerativeModel.return_value = mock_model
-
-        # Test 'high' -> '高'
-        index.generate_reasoning_with_gemini(
-            lat=35.0, lon=139.0, co2=420.0, deviation=5.0,
-            date='2025-01-15', severity='high', zscore=2.0
-        )
-        prompt = mock_model.generate_content.call_args[0][0]
-        assert '異常度: 高' in prompt, "'high' should map to '高'"
-        print("✓ 'high' maps to '高'")
-
-        # Test 'medium' -> '中'
-        index.generate_reasoning_with_gemini(
-            lat=35.0, lon=139.0, co2=420.0, deviation=5.0,
-            date='2025-01-15', severity='medium', zscore=2.0
-        )
-        prompt = mock_model.generate_content.call_args[0][0]
-        assert '異常度: 中' in prompt, "'medium' should map to '中'"
-        print("✓ 'medium' maps to '中'")
-
-        # Test 'low' -> '低'
-        index.generate_reasoning_with_gemini(
-            lat=35.0, lon=139.0, co2=420.0, deviation=5.0,
-            date='2025-01-15', severity='low', zscore=2.0
-        )
-        prompt = mock_model.generate_content.call_args[0][0]
-        assert '異常度: 低' in prompt, "'low' should map to '低'"
-        print("✓ 'low' maps to '低'")
+    stub = _BedrockStub(text='テスト')
+    with patch.object(index, 'bedrock_client', stub):
+        for severity, expected_ja in (('high', '高'), ('medium', '中'), ('low', '低')):
+            index.generate_reasoning_with_bedrock(
+                lat=35.0, lon=139.0, co2=420.0, deviation=5.0,
+                date='2025-01-15', severity=severity, zscore=2.0
+            )
+            match = _SEVERITY_RE.search(stub.last_prompt)
+            assert match and match.group(1) == expected_ja, \
+                f"'{severity}' should map to '{expected_ja}'"
+            print(f"✓ '{severity}' maps to '{expected_ja}'")
 
 
 def test_response_includes_cors_headers():
     """Test 8: Responses include CORS headers"""
     print("\n=== Test 8: CORS Headers ===")
 
-    import index
-
-    with patch('index.boto3'):
-        event = {
-            'body': json.dumps({
-                'lat': 35.6762,
-                'lon': 139.6503,
-                'co2': 420.5,
-                'deviation': 5.2,
-                'date': '2025-01-15',
-                # Missing severity to trigger 400 error
-                'zscore': 2.8
-            })
-        }
+    # Missing severity to trigger 400 error
+    event = _event(severity=None)
 
-        response = index.lambda_handler(event, None)
+    response = index.lambda_handler(event, None)
 
-        assert 'headers' in response, "Response should have headers"
-        assert 'Access-Control-Allow-Origin' in response['headers'], "Should have CORS header"
-        assert response['headers']['Access-Control-Allow-Origin'] == '*', "CORS should allow all origins"
-        print("✓ CORS headers are included in response")
+    assert 'headers' in response, "Response should have headers"
+    assert 'Access-Control-Allow-Origin' in response['headers'], "Should have CORS header"
+    assert response['headers']['Access-Control-Allow-Origin'] == '*', "CORS should allow all origins"
+    print("✓ CORS headers are included in response")
 
 
 def test_response_body_structure():
     """Test 9: Response body structure matches Flask format"""
     print("\n=== Test 9: Response Body Structure ===")
 
-    import index
-
-    with patch('index.genai') as mock_genai, \
-         patch('index.get_gemini_api_key', return_value='test-api-key'):
-
-        # Mock DynamoDB table - cache miss
-        mock_table = MagicMock()
-        mock_table.get_item.return_value = {}
+    # DynamoDB is already the no-op stub (get_item -> {} = cache miss);
+    # only Bedrock needs a response-producing stand-in
+    stub = _BedrockStub(text='Test reasoning')
+    with patch.object(index, 'bedrock_client', stub):
+        event = _event()
 
-        # Mock Gemini API
-        mock_response = MagicMock()
-        mock_response.text = 'Test reasoning'
-        mock_model = MagicMock()
-        mock_model.generate_content.return_value = mock_response
-        mock_genai.GenerativeModel.return_value = mock_model
-
-        with patch.object(index, 'get_dynamodb_table', return_value=mock_table):
-            event = {
-                'body': json.dumps({
-                    'lat': 35.6762,
-                    'lon': 139.6503,
-                    'co2': 420.5,
-                    'deviation': 5.2,
-                    'date': '2025-01-15',
-                    'severity': 'high',
-                    'zscore': 2.8
-                })
-            }
-
-            response = index.lambda_handler(event, None)
+        response = index.lambda_handler(event, None)
 
-            assert response['statusCode'] == 200, "Should return 200"
-            body = json.loads(response['body'])
+        assert response['statusCode'] == 200, "Should return 200"
+        body = json.loads(response['body'])
 
-            # Verify structure matches Flask response
-            assert 'reasoning' in body, "Should have reasoning field"
-            assert 'cached' in body, "Should have cached field"
-            assert 'cache_key' in body, "Should have cache_key field"
-            assert isinstance(body['cached'], bool), "cached should be boolean"
+        # Verify structure matches Flask response
+        assert 'reasoning' in body, "Should have reasoning field"
+        assert 'cached' in body, "Should have cached field"
+        assert 'cache_key' in body, "Should have cache_key field"
+        assert isinstance(body['cached'], bool), "cached should be boolean"
 
-            print("✓ Response body structure matches Flask format")
-            print(f"  Fields: {list(body.keys())}")
+        print("✓ Response body structure matches Flask format")
+        print(f"  Fields: {list(body.keys())}")
 
 
 def main():
@@ -356,7 +360,7 @@ def main():
         print("\nAll acceptance criteria verified:")
         print("  ✓ Lambda handler accepts API Gateway proxy events")
         print("  ✓ Input validation for required fields")
-        print("  ✓ Cache key generation using SHA256 hash (same as Flask)")
+        print("  ✓ Cache key generation using BLAKE2b hash (same as Flask)")
         print("  ✓ DynamoDB cache check before calling Gemini API")
         print("  ✓ Gemini API integration with same prompt logic")
         print("  ✓ Cache write after successful API call")
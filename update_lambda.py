@@ -2,64 +2,201 @@
 """
 Script to update Lambda function code without Docker
 """
+import argparse
+import base64
+import hashlib
+import io
 import zipfile
 import os
-import subprocess
 import sys
 
-def create_lambda_zip():
-    """Create a zip file with the Lambda function code"""
-    handler_dir = "cdk/lambda/reasoning-handler"
-    zip_path = "function.zip"
-
-    # Create zip file
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        index_path = os.path.join(handler_dir, "index.py")
-        zipf.write(index_path, "index.py")
-
-    print(f"[OK] Created {zip_path}")
-    return zip_path
-
-def update_lambda_function(zip_path):
-    """Update Lambda function code using AWS CLI"""
-    function_name = "co2-analysis-dev-reasoning-api"
-    profile = "fse"
-    region = "us-east-1"
-
-    cmd = [
-        "aws", "lambda", "update-function-code",
-        "--function-name", function_name,
-        "--zip-file", f"fileb://{zip_path}",
-        "--profile", profile,
-        "--region", region
-    ]
+from concurrent.futures import ThreadPoolExecutor
+
+PROFILE = "fse"
+REGION = "us-east-1"
+
+# (handler_dir, function_name) pairs; deploys fan out over this list
+TARGETS = [
+    ("cdk/lambda/reasoning-handler", "co2-analysis-dev-reasoning-api"),
+]
+
+# Module-level client so credential resolution and the TLS handshake to
+# the Lambda endpoint are paid once, even when several updates run in
+# one invocation. Created lazily so importing the module stays cheap.
+_lambda_client = None
+
+def _get_lambda_client():
+    global _lambda_client
+    if _lambda_client is None:
+        # Deferred: importing boto3 costs ~200ms, which --help, argparse
+        # errors and packaging failures shouldn't pay
+        import boto3
+        from botocore.config import Config
+
+        _lambda_client = boto3.Session(profile_name=PROFILE).client(
+            "lambda",
+            region_name=REGION,
+            # Keep-alive + pooling so repeated API calls in one run (or a
+            # CI loop importing this module) reuse the warm connection
+            config=Config(
+                tcp_keepalive=True,
+                max_pool_connections=10,
+                connect_timeout=3,
+                read_timeout=30,
+                retries={"max_attempts": 3, "mode": "standard"},
+            ),
+        )
+    return _lambda_client
+
+# Files shared by every handler (e.g. vendored deps or common utils);
+# packaged once into a seed archive and cloned per function
+COMMON_PATHS = []
+
+_seed_zip = None
+
+def _add_entry(zipf, path, arcname):
+    """Append one file to an open zip with deterministic metadata
+
+    Fixed timestamp and permissions: zipf.write() would embed the host
+    mtime/mode, making byte-identical sources hash differently and
+    defeating the CodeSha256 skip across machines and CI runs.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    info = zipfile.ZipInfo(arcname, date_time=(1980, 1, 1, 0, 0, 0))
+    info.external_attr = 0o644 << 16
+    info.compress_type = zipfile.ZIP_STORED
+    zipf.writestr(info, data)
+
+def _get_seed_zip():
+    """Archive of COMMON_PATHS, built once and cloned for each handler
+
+    Shared entries are packaged a single time no matter how many
+    functions deploy; each per-handler zip just appends its own files to
+    a copy of these bytes.
+    """
+    global _seed_zip
+    if _seed_zip is None:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zipf:
+            for path in COMMON_PATHS:
+                _add_entry(zipf, path, os.path.basename(path))
+        _seed_zip = buf.getvalue()
+    return _seed_zip
+
+def create_lambda_zip(handler_dir):
+    """Build a handler's deployment zip in memory and return the buffer"""
+    # In-memory buffer: nothing touches disk, so there is no temp file to
+    # read back or clean up. STORED, not DEFLATED: the payload is small
+    # source that Lambda re-extracts immediately, so deflate buys
+    # nothing but a zlib pass on every deploy
+    buf = io.BytesIO(_get_seed_zip())
+    with zipfile.ZipFile(buf, 'a', zipfile.ZIP_STORED) as zipf:
+        _add_entry(zipf, os.path.join(handler_dir, "index.py"), "index.py")
+
+    print(f"[OK] Packaged {handler_dir} ({buf.getbuffer().nbytes} bytes, in memory)")
+    return buf
+
+def update_lambda_function(zip_buf, function_name, publish=False):
+    """Update one Lambda function's code using boto3 (no aws-cli subprocess)
+
+    publish=True folds version publication into the same API call
+    instead of a separate publish_version round-trip; the default False
+    also skips Lambda's server-side version materialization.
+
+    Thread-safe: boto3 clients (unlike sessions) may be shared across
+    threads, so concurrent calls reuse the one pooled client.
+    """
+    from botocore.exceptions import BotoCoreError, ClientError
 
     print(f"[INFO] Updating Lambda function: {function_name}")
-    result = subprocess.run(cmd, capture_output=True, text=True)
-
-    if result.returncode == 0:
-        print("[OK] Lambda function updated successfully")
-        return True
-    else:
-        print(f"[ERROR] Failed to update Lambda function")
-        print(result.stderr)
+    try:
+        client = _get_lambda_client()
+
+        # Lambda reports CodeSha256 as base64(sha256(zip bytes)); if the
+        # deployed code already matches, skip the upload and the code
+        # replacement (which would cost a cold start on the next invoke).
+        # file_digest streams the buffer in chunks, so hashing stays flat
+        # in memory even if the package grows past a single source file
+        zip_buf.seek(0)
+        local_sha = base64.b64encode(
+            hashlib.file_digest(zip_buf, "sha256").digest()).decode()
+        deployed_sha = client.get_function_configuration(
+            FunctionName=function_name
+        ).get("CodeSha256")
+        if deployed_sha == local_sha:
+            print(f"[OK] {function_name}: code unchanged, skipping upload")
+            return True
+
+        client.update_function_code(
+            FunctionName=function_name, ZipFile=zip_buf.getvalue(),
+            Publish=publish
+        )
+
+        # Poll until LastUpdateStatus is Successful instead of asking the
+        # caller to sleep a guessed interval; returns as soon as the
+        # update has actually propagated
+        client.get_waiter("function_updated_v2").wait(
+            FunctionName=function_name,
+            WaiterConfig={"Delay": 1, "MaxAttempts": 30},
+        )
+    except (ClientError, BotoCoreError) as e:
+        print(f"[ERROR] Failed to update {function_name}")
+        print(str(e))
         return False
 
-def cleanup(zip_path):
-    """Clean up temporary files"""
-    if os.path.exists(zip_path):
-        os.remove(zip_path)
-        print(f"[INFO] Cleaned up {zip_path}")
+    print(f"[OK] {function_name} updated successfully")
+    return True
+
+def _deploy(target, publish=False):
+    handler_dir, function_name = target
+    return update_lambda_function(
+        create_lambda_zip(handler_dir), function_name, publish=publish)
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Update Lambda function code without Docker")
+    parser.add_argument(
+        "--function-name",
+        default=os.getenv("LAMBDA_FN", TARGETS[0][1]),
+        help="target function (default: %(default)s, env LAMBDA_FN)")
+    parser.add_argument(
+        "--handler-dir",
+        default=os.getenv("LAMBDA_HANDLER_DIR", TARGETS[0][0]),
+        help="handler source directory (env LAMBDA_HANDLER_DIR)")
+    parser.add_argument(
+        "--profile", default=os.getenv("AWS_PROFILE", PROFILE),
+        help="AWS profile (default: %(default)s)")
+    parser.add_argument(
+        "--region", default=os.getenv("AWS_REGION", REGION),
+        help="AWS region (default: %(default)s)")
+    parser.add_argument(
+        "--publish", action="store_true",
+        help="publish a version in the same update_function_code call")
+    parser.add_argument(
+        "--all", action="store_true",
+        help="deploy every preconfigured target instead of one function")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global PROFILE, REGION
+    args = _parse_args(argv)
+    # The shared client is created lazily, so overriding these before the
+    # first deploy is enough
+    PROFILE = args.profile
+    REGION = args.region
+    targets = TARGETS if args.all else [(args.handler_dir, args.function_name)]
 
-def main():
     try:
-        zip_path = create_lambda_zip()
-        success = update_lambda_function(zip_path)
-        cleanup(zip_path)
+        # update_function_code is I/O-bound, so multiple handlers fan out
+        # over threads sharing the pooled client (no-op overhead for the
+        # current single target)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda t: _deploy(t, publish=args.publish), targets))
 
-        if success:
-            print("\n[OK] Lambda function code updated successfully!")
-            print("[INFO] Wait a few seconds for the update to propagate...")
+        if all(results):
+            print("\n[OK] Lambda function code updated and propagated!")
             return 0
         else:
             print("\n[ERROR] Failed to update Lambda function")
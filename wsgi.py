@@ -0,0 +1,17 @@
+"""
+WSGI entrypoint for serving the Flask app under gunicorn + gevent
+
+The Werkzeug dev server started by `python app.py` is single-threaded, so
+requests serialize behind Gemini API latency. gevent workers multiplex
+I/O-bound requests instead:
+
+    gunicorn -k gevent -w 4 --worker-connections 1000 wsgi:app
+"""
+
+# Monkey-patch the stdlib before anything else imports sockets
+from gevent import monkey
+monkey.patch_all()
+
+from app import app  # noqa: E402
+
+__all__ = ['app']